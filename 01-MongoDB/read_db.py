@@ -1,10 +1,10 @@
 import json
 
-import pymongo
 from bson.objectid import ObjectId
-def read_mongodb(db_name="default_db", table_name="default_table"):
+from inster_data_function import MONGO_URI, get_client
+def read_mongodb(db_name="default_db", table_name="default_table", uri=MONGO_URI):
     print("正在连接数据库...")
-    client = pymongo.MongoClient(host="localhost", port=27017)
+    client = get_client(uri)
     print("连接成功!")
     # client = pymongo.MongoClient("mongodb://localhost:27017/")
     # db = client.test
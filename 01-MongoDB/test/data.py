@@ -1,7 +1,28 @@
 # 数据存储函数，Mongodb
+import os
+import threading
 import pymongo
 from faker import Faker
 import random
+MONGO_URI = "mongodb://localhost:27017/"
+CLIENTS = {}  # (连接地址, 进程号) -> MongoClient
+CLIENTS_LOCK = threading.Lock()
+
+
+def get_client(uri=MONGO_URI):
+    """
+    按连接地址缓存 MongoClient：同一个进程里反复调用拿到的是同一个客户端，
+    不会每写一条数据就重新建立连接、再启动一遍监控线程。
+    MongoClient 不能跨 fork 使用，所以缓存的 key 里带上了进程号，子进程会自动创建自己的客户端。
+    """
+    key = (uri, os.getpid())
+    with CLIENTS_LOCK:
+        client = CLIENTS.get(key)
+        if client is None:
+            client = CLIENTS[key] = pymongo.MongoClient(uri)
+    return client
+
+
 def judge(insert_data, collection):
     if isinstance(insert_data, list):
         collection.insert_many(insert_data)
@@ -10,9 +31,9 @@ def judge(insert_data, collection):
     else:
         print("插入的数据不支持，函数：judge！")
 
-def write_mongodb(db_name="default_db", table_name="default_table", insert_data="None"):
+def write_mongodb(db_name="default_db", table_name="default_table", insert_data="None", uri=MONGO_URI):
     print("正在连接数据库...")
-    client = pymongo.MongoClient(host="localhost", port=27017)
+    client = get_client(uri)
     print("连接成功!")
     # client = pymongo.MongoClient("mongodb://localhost:27017/")
     # db = client.test
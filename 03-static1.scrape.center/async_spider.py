@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+# @Author  : AI悦创
+# @FileName: async_spider.py
+# @Software: PyCharm
+# @Blog    ：https://bornforthis.cn/
+# asyncio、aiohttp、pyquery、PymongoDB
+"""
+spider.py 的异步版本：
+1. 阶段和 spider.py 完全一致：scrape_index → parse_index → scrape_details → parse_details；
+1. Same stages as spider.py: scrape_index → parse_index → scrape_details → parse_details.
+2. 用 aiohttp 并发请求，asyncio.Semaphore 限制同时在途的请求数量；
+2. Requests run concurrently through aiohttp, bounded by an asyncio.Semaphore.
+3. 整个爬取的耗时接近最慢的那一页，而不是所有页面耗时之和。
+3. The whole crawl takes about as long as the slowest page instead of the sum of all pages.
+-------------------------------------------------
+"""
+import argparse
+import asyncio  # 事件循环
+import logging
+import time
+import aiohttp  # 异步请求
+from spider import TOTAL_PAGE, get_index_url, parse_index, parse_total_page, parse_record, save_data_two, create_writer, \
+    unique, is_new
+from rate_limit import HostRateLimiter, AIMDController, AsyncLimiter
+from retry import RetryPolicy
+from decoding import ACCEPT_ENCODING, decode
+
+CONCURRENCY = 10  # 同时在途的最大请求数
+
+RATE_LIMITER = None  # 每个域名的令牌桶限速
+CONTROLLER = None  # AIMD 自适应并发控制
+RETRY = RetryPolicy()  # 失败重试策略
+
+
+# 1
+async def scrape_page(session, semaphore, url):
+    """
+    与 spider.scrape_page 一样的通用爬取方法，只是换成了协程。
+    :param session: aiohttp.ClientSession
+    :param semaphore: 限制并发数量的信号量，自适应模式下是 AsyncLimiter
+    :param url:
+    :return: response.text >>> HTML
+    """
+    for attempt in range(RETRY.retries + 1):
+        status, retry_after = None, None
+        if RATE_LIMITER:
+            await RATE_LIMITER.wait_async(url)
+        async with semaphore:
+            start = time.monotonic()
+            try:
+                async with session.get(url) as response:
+                    status = response.status
+                    if response.status == 200:
+                        # 和 spider.py 一样按声明的编码解码，不让 aiohttp 用 chardet 猜
+                        html, _ = decode(await response.read(), response.headers.get("Content-Type"))
+                        return html
+                    retry_after = response.headers.get("Retry-After")
+                    logging.error("get invalid status code %s while scraping %s", response.status, url)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                logging.error("error occurred while scraping %s", url, exc_info=True)
+            finally:
+                if CONTROLLER:
+                    CONTROLLER.record(time.monotonic() - start, status)
+        if not RETRY.should_retry(attempt, status):
+            return None
+        # 等待时已经释放了并发名额，也不会阻塞其它协程
+        delay = RETRY.delay(attempt, retry_after)
+        logging.warning("retry %s in %.1fs (%s/%s)", url, delay, attempt + 1, RETRY.retries)
+        await asyncio.sleep(delay)
+
+
+# 2
+async def scrape_index(session, semaphore, page):
+    index_url = get_index_url(page)
+    return await scrape_page(session, semaphore, index_url)
+
+
+# 4 请求详情页
+async def scrape_details(session, semaphore, url):
+    return await scrape_page(session, semaphore, url)
+
+
+async def crawl_detail(session, semaphore, writer, url):
+    html = await scrape_details(session, semaphore, url)
+    if not html:
+        return
+    data = parse_record(url, html)
+    print(data)
+    # MongoDB 写入是阻塞的，放到线程里执行，避免卡住事件循环
+    await asyncio.to_thread(writer.add, data)
+    await asyncio.to_thread(save_data_two, data)
+
+
+async def crawl_index(session, semaphore, writer, page, index_html=None):
+    index_html = index_html or await scrape_index(session, semaphore, page)
+    if not index_html:
+        return
+    # 3 解析索引页后，所有详情页同时发出去；和 spider.py 一样先去重，已经入库的不再爬
+    urls = filter(is_new, unique(parse_index(index_html)))
+    await asyncio.gather(*(crawl_detail(session, semaphore, writer, url) for url in urls))
+
+
+async def crawl(concurrency=CONCURRENCY, rate=None, burst=1, adaptive=False, retries=2, backoff=0.5):
+    """
+    :param concurrency: 最大并发数，自适应模式下是并发数的上限
+    :param rate: 每个域名每秒最多请求数，None 表示不限速
+    :param burst: 限速时允许的突发请求数
+    :param adaptive: 是否开启 AIMD 自适应并发
+    :param retries: 失败后的重试次数
+    :param backoff: 第一次重试前的基准等待秒数
+    """
+    global RATE_LIMITER, CONTROLLER, RETRY
+    RETRY = RetryPolicy(retries=retries, backoff=backoff)
+    RATE_LIMITER = HostRateLimiter(rate, burst) if rate else None
+    CONTROLLER = AIMDController(maximum=concurrency) if adaptive else None
+    semaphore = AsyncLimiter(CONTROLLER) if adaptive else asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    writer = create_writer()
+    try:
+        async with aiohttp.ClientSession(connector=connector, headers={"Accept-Encoding": ACCEPT_ENCODING}) as session:
+            # 先爬第一页，从分页器里读出总页数，其余索引页再一起发出去
+            first_html = await scrape_index(session, semaphore, 1)
+            total_page = (parse_total_page(first_html) if first_html else None) or TOTAL_PAGE
+            await asyncio.gather(crawl_index(session, semaphore, writer, 1, first_html),
+                                 *(crawl_index(session, semaphore, writer, page) for page in range(2, total_page + 1)))
+    finally:
+        # 中途出错也要把攒着的数据写进 MongoDB
+        await asyncio.to_thread(writer.close)
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description="static1.scrape.center 异步爬虫")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="最大并发数")
+    parser.add_argument("--rate", type=float, default=None, help="每个域名每秒最多请求数，不指定则不限速")
+    parser.add_argument("--burst", type=int, default=1, help="限速时允许的突发请求数")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="AIMD 自适应并发：延迟平稳时逐步加并发，遇到 429/5xx 减半")
+    parser.add_argument("--retries", type=int, default=2, help="请求失败（网络异常、429、5xx）后的重试次数")
+    parser.add_argument("--backoff", type=float, default=0.5, help="第一次重试前的基准等待秒数")
+    return parser.parse_args(args)
+
+
+def main():
+    args = parse_args()
+    asyncio.run(crawl(args.concurrency, args.rate, args.burst, args.adaptive, args.retries, args.backoff))
+
+
+if __name__ == '__main__':
+    main()
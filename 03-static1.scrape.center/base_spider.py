@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+# @Author  : AI悦创
+# @FileName: base_spider.py
+# @Software: PyCharm
+# @Blog    ：https://bornforthis.cn/
+# threading、queue、requests、PymongoDB
+"""
+通用的爬虫基类 Spider：
+1. 子类只需要写 parse_index（索引页 → 详情页 URL）和 parse_details（详情页 → 字典）；
+1. Subclasses only write parse_index (index page → detail URLs) and parse_details (detail page → dict).
+2. 请求走 fetcher.Fetcher：连接池按抓取线程数建好，限速、重试、解码全部自带，不依赖 spider.py 的全局配置；
+2. Requests go through fetcher.Fetcher, pooled to the fetch threads with rate limiting, retries and decoding built in, independent of spider.py's globals.
+3. 抓取 → 解析 → 存储 是三组线程组成的流水线，存储用 BulkWriter 批量写入 MongoDB。
+3. Fetch → parse → store run as a threaded pipeline and storage batches writes through BulkWriter.
+
+class MySpider(Spider):
+    base_url = "https://static1.scrape.center"
+
+    def parse_index(self, html):
+        ...  # yield 详情页 URL
+
+    def parse_details(self, html):
+        ...  # return dict
+
+MySpider().run()
+-------------------------------------------------
+"""
+import logging
+import threading
+from queue import Queue
+
+from dedup import canonicalize_url, make_seen_set
+from fetcher import Fetcher
+from inster_data_function import BulkWriter, MONGO_URI, get_client
+from parsers import parse_total_page
+
+STOP = object()  # 结束标记，每个线程收到一个就退出
+
+
+def start_stage(name, func, inbox, outbox, workers):
+    """
+    启动一组线程：从 inbox 取任务，交给 func 处理，结果放进 outbox。
+    :param name: 阶段名称，只用于日志
+    :param func: 处理函数，返回 None 表示这个任务到此为止
+    :param inbox: 输入队列
+    :param outbox: 输出队列，最后一个阶段为 None
+    :param workers: 线程数
+    :return: 线程列表
+    """
+
+    def worker():
+        while True:
+            item = inbox.get()
+            if item is STOP:
+                break
+            try:
+                result = func(item)
+            except Exception:
+                logging.error("%s stage failed on %r", name, item, exc_info=True)
+                continue
+            if result is not None and outbox is not None:
+                outbox.put(result)  # 队列满了会阻塞在这里，形成背压
+
+    threads = [threading.Thread(target=worker, name=f"{name}-{i}", daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def stop_stage(inbox, threads):
+    """
+    给每个线程发一个结束标记，并等待它们把手上的任务做完。
+    """
+    for _ in threads:
+        inbox.put(STOP)
+    for thread in threads:
+        thread.join()
+
+
+class Spider(object):
+    base_url = None  # 站点地址
+    index_path = "/page/{page}"  # 索引页路径
+    total_page = None  # 索引页数量，None 表示从第一页的分页器读出来
+    default_total_page = 10  # 分页器也读不出来时的页数
+    headers = {}  # 额外的请求头，比如 User-Agent，只加在这个爬虫自己的 Session 上
+    retries = 2  # 请求失败（网络异常、429、5xx）后的重试次数
+    rate = None  # 每个域名每秒最多请求数，None 表示不限速
+    burst = 1  # 限速时允许的突发请求数
+
+    db_name = None  # MongoDB 数据库名，None 表示不存储，只打印
+    table_name = None  # MongoDB 表名
+    key = "name"  # upsert 时用来判断是不是同一条数据的字段
+
+    fetch_workers = 8
+    parse_workers = 2
+    store_workers = 2
+    queue_size = 50  # 每个队列最多缓存的任务数
+    batch_size = 100  # 批量写入 MongoDB 的条数
+
+    def __init__(self, uri=MONGO_URI, **options):
+        """
+        :param uri: MongoDB 连接地址
+        :param options: 覆盖上面的类属性，比如 Spider(fetch_workers=16)
+        """
+        for name, value in options.items():
+            if not hasattr(type(self), name):
+                raise TypeError(f"unknown option {name!r}")
+            setattr(self, name, value)
+        self.uri = uri
+        self.seen = make_seen_set()
+        # 连接池和抓取线程一样大，每个线程都能复用 keep-alive 连接
+        self.fetcher = Fetcher(self.fetch_workers, self.headers, retries=self.retries, rate=self.rate,
+                               burst=self.burst)
+
+    # ---------- 子类需要实现的部分 ----------
+    def parse_index(self, html):
+        """
+        :return: 详情页 URL 的生成器
+        """
+        raise NotImplementedError
+
+    def parse_details(self, html):
+        """
+        :return: 一条数据（字典），返回 None 表示不存储
+        """
+        raise NotImplementedError
+
+    # ---------- 可以按需覆盖的部分 ----------
+    def index_url(self, page):
+        return self.base_url + self.index_path.format(page=page)
+
+    def parse_total_page(self, html):
+        """
+        :return: 索引页分页器里的总页数，读不到时返回 None
+        """
+        return parse_total_page(html)
+
+    def index_pages(self):
+        """
+        :return: 索引页 HTML 的生成器；第一页既用来读总页数，也直接拿来解析，不会请求两次
+        """
+        html = self.fetch(self.index_url(1))
+        yield html
+        total_page = self.total_page or (html and self.parse_total_page(html)) or self.default_total_page
+        for page in range(2, total_page + 1):
+            yield self.fetch(self.index_url(page))
+
+    def fetch(self, url):
+        return self.fetcher.get(url)
+
+    def detail_urls(self):
+        """
+        逐页爬取索引页，解析出的详情页 URL 去重后马上交给抓取线程。
+        """
+        for html in self.index_pages():
+            if not html:
+                continue
+            for url in self.parse_index(html):
+                # 规范化的 URL 只用来去重，请求的还是原来的 URL
+                if self.seen.add(canonicalize_url(url)):
+                    yield url
+
+    def parse_record(self, url, html):
+        data = self.parse_details(html)
+        if data is not None:
+            data.setdefault("url", url)
+        return data
+
+    def create_writer(self):
+        if not self.db_name:
+            return None
+        collection = get_client(self.uri)[self.db_name][self.table_name or self.db_name]
+        return BulkWriter(collection, key=self.key, batch_size=self.batch_size)
+
+    def store(self, writer, data):
+        print(data)
+        if writer:
+            writer.add(data)
+
+    def finish(self):
+        pass
+
+    # ---------- 运行 ----------
+    def fetch_detail(self, url):
+        html = self.fetch(url)
+        if html:
+            return url, html
+
+    def run(self):
+        url_queue = Queue(maxsize=self.queue_size)
+        html_queue = Queue(maxsize=self.queue_size)
+        data_queue = Queue(maxsize=self.queue_size)
+        writer = self.create_writer()
+        fetchers = start_stage("fetch", self.fetch_detail, url_queue, html_queue, self.fetch_workers)
+        parsers = start_stage("parse", lambda item: self.parse_record(*item), html_queue, data_queue,
+                              self.parse_workers)
+        storers = start_stage("store", lambda data: self.store(writer, data), data_queue, None,
+                              self.store_workers)
+
+        try:
+            for url in self.detail_urls():
+                url_queue.put(url)
+        finally:
+            # 索引页出错也要让已经排队的任务做完，并把 writer 里没写的数据写进 MongoDB
+            # 按顺序关闭：上游全部结束后，下游才会收到结束标记
+            stop_stage(url_queue, fetchers)
+            stop_stage(html_queue, parsers)
+            stop_stage(data_queue, storers)
+            if writer:
+                writer.close()
+            self.fetcher.close()
+        self.finish()
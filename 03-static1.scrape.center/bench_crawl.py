@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+# @Author  : AI悦创
+# @FileName: bench_crawl.py
+# @Software: PyCharm
+# @Blog    ：https://bornforthis.cn/
+"""
+端到端的爬虫基准测试：
+1. 用 bench_server.py 在本地回放录制好的网页，不访问真实站点，结果可以重复对比；
+1. Replays recorded pages through bench_server.py, so runs never touch the live site and can be compared.
+2. 按 spider.py 的串行 / 多进程模式或者 pipeline.py 的流水线模式完整跑一遍，包括写入 MongoDB；
+   数据写进 --db-prefix 开头的临时数据库，不会覆盖真实的 Movies / Movie_two；
+2. Runs the whole crawl, MongoDB writes included, in spider.py's serial / --workers mode or pipeline.py's mode.
+   Records go to scratch databases named with --db-prefix, never to the real Movies / Movie_two.
+3. 报告每秒爬取的网页数、每页的解析耗时和存储耗时。
+3. Reports pages per second, parse time per page and storage time.
+
+python bench_crawl.py --cache-dir recorded --mode pipeline --latency 0.1 --fetch-workers 16
+其余参数原样交给 spider.py / pipeline.py。
+-------------------------------------------------
+"""
+import argparse
+import time
+
+import pipeline
+import spider
+from bench_server import add_server_arguments, start_server
+from metrics import METRICS
+
+
+def run(mode, base_url, extra_args, db_prefix="bench_"):
+    """
+    :param mode: serial / workers / pipeline
+    :param extra_args: 交给 spider.py 或 pipeline.py 的命令行参数
+    :param db_prefix: 数据库名前缀，基准测试的数据不能写进真实的数据库
+    :return: 耗时（秒）
+    """
+    extra_args = ["--db-prefix", db_prefix] + extra_args
+    # 只统计这一次运行
+    METRICS.drain()
+    METRICS.started = time.monotonic()
+    start = time.monotonic()
+    if mode == "pipeline":
+        args = pipeline.parse_args(["--base-url", base_url] + extra_args)
+        spider.configure(args)
+        pipeline.run(fetch_workers=args.fetch_workers, parse_workers=args.parse_workers,
+                     store_workers=args.store_workers, queue_size=args.queue_size)
+        spider.finish()
+    else:
+        args = spider.parse_args(["--base-url", base_url] + extra_args)
+        if mode == "workers" and not args.workers:
+            args.workers = args.pool_size = 4
+        spider.main(args)
+    return time.monotonic() - start
+
+
+def report(mode, elapsed):
+    stages = METRICS.stages
+    fetched, parsed, saved = stages.get("scrape_page"), stages.get("parse_details"), stages.get("save_data")
+    lines = [f"mode             {mode}", f"elapsed          {elapsed:.2f}s"]
+    if fetched:
+        lines.append(f"pages fetched    {fetched.count} ({fetched.count / elapsed:.1f} pages/s)")
+    if parsed and parsed.count:
+        lines.append(f"parse per page   {parsed.total / parsed.count * 1000:.2f} ms")
+    if saved and saved.count:
+        lines.append(f"storage          {saved.total:.2f}s over {saved.count} writes")
+    print("\n".join(lines))
+
+
+def main():
+    parser = add_server_arguments(argparse.ArgumentParser(description="爬虫端到端基准测试"))
+    parser.add_argument("--mode", default="serial", choices=["serial", "workers", "pipeline"],
+                        help="spider.py 串行、spider.py --workers 多进程或 pipeline.py 流水线")
+    parser.add_argument("--db-prefix", default="bench_",
+                        help="基准测试写入的数据库名前缀，不能为空，避免覆盖真实数据")
+    args, extra_args = parser.parse_known_args()
+    if not args.db_prefix:
+        parser.error("--db-prefix must not be empty, the benchmark would overwrite the real Movies database")
+    server, base_url = start_server(args.cache_dir, 0, args.latency, args.jitter, args.error_rate)
+    try:
+        elapsed = run(args.mode, base_url, extra_args, args.db_prefix)
+    finally:
+        server.shutdown()
+    report(args.mode, elapsed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+# @Author  : AI悦创
+# @FileName: bench_parsers.py
+# @Software: PyCharm
+# @Blog    ：https://bornforthis.cn/
+# timeit、pyquery、lxml、BeautifulSoup
+"""
+解析函数的微基准测试：
+1. 用 spider.py --cache-dir 录制下来的网页作为固定语料，不发任何请求；
+1. Uses pages recorded with spider.py --cache-dir as a frozen corpus; no requests are sent.
+2. 对比 spider.py 的 pyquery 写法、parsers.py 的 lxml 写法、streaming.py 的边下载边解析和 student/scr1_spider.py 的 BeautifulSoup 写法；
+2. Compares the pyquery path in spider.py, the lxml path in parsers.py, the streaming parser in streaming.py and the BeautifulSoup path from student/scr1_spider.py.
+3. --save 保存一次结果，之后用 --compare 对比，变慢超过 --tolerance 就以非 0 状态退出。
+3. --save stores a run; --compare checks a later run against it and exits non-zero when something got slower than --tolerance.
+
+python bench_parsers.py --cache-dir recorded --save baseline.json
+python bench_parsers.py --cache-dir recorded --compare baseline.json
+-------------------------------------------------
+"""
+import argparse
+import functools
+import json
+import sys
+import timeit
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+import spider
+from http_cache import ResponseCache
+from parsers import WHITESPACE, parse_details_lxml, select_fields, to_date, to_float
+from streaming import IndexStream, stream_details
+
+
+def squash(text):
+    return WHITESPACE.sub(" ", text).strip()
+
+
+# student/scr1_spider.py 的写法：BeautifulSoup(html, "lxml") + select
+def parse_index_bs4(html):
+    soup = BeautifulSoup(html, "lxml")
+    for link in soup.select(".el-card .name"):
+        yield urljoin(spider.BASE_URL, link.get("href"))
+
+
+def parse_details_bs4(html):
+    soup = BeautifulSoup(html, "lxml")
+    img_cover = soup.select_one("img.cover")
+    info = " ".join(squash(item.get_text()) for item in soup.select(".info") if "上映" in item.get_text())
+    return {
+        "img_cover": img_cover.get("src") if img_cover else None,
+        "name": " ".join(squash(item.get_text()) for item in soup.select("a > h2")),
+        "categories": [squash(item.get_text()) for item in soup.select(".categories button span")],
+        "published_at": to_date(info),
+        "drama": " ".join(squash(item.get_text()) for item in soup.select(".drama p")),
+        "score": to_float(" ".join(squash(item.get_text()) for item in soup.select("p.score"))),
+    }
+
+
+# spider.py --stream 的写法：整页作为一块喂给 HTMLPullParser，结果应该和 pyquery 一致
+def parse_details_stream(html, fields=None):
+    return stream_details([html.encode("utf-8")], select_fields(fields), "utf-8")
+
+
+INDEX_PARSERS = {
+    # 用 __wrapped__ 绕开 METRICS.timed，不然每次调用都多一层计时和采样，对 pyquery 不公平
+    "pyquery": lambda html: list(spider.parse_index.__wrapped__(html)),
+    "bs4": lambda html: list(parse_index_bs4(html)),
+    "stream": lambda html: list(IndexStream([html.encode("utf-8")], spider.BASE_URL, "utf-8")),
+}
+DETAIL_PARSERS = {
+    "pyquery": spider.parse_details_pyquery,
+    "lxml": parse_details_lxml,
+    "bs4": parse_details_bs4,
+    "stream": parse_details_stream,
+}
+
+
+def load_corpus(cache_dir):
+    """
+    :return: (索引页列表, 详情页列表)
+    """
+    cache = ResponseCache(cache_dir)
+    index_pages, detail_pages = [], []
+    for url in cache.urls():
+        if "/detail/" in url:
+            detail_pages.append(cache.load(url))
+        elif "/page/" in url:
+            index_pages.append(cache.load(url))
+    return index_pages, detail_pages
+
+
+def bench(parsers, pages, repeat):
+    """
+    :return: {解析后端: 每页耗时（毫秒）}，取 repeat 次里最快的一次
+    """
+    results = {}
+    for name, parse in parsers.items():
+        best = min(timeit.repeat(lambda: [parse(page) for page in pages], number=1, repeat=repeat))
+        results[name] = best / len(pages) * 1000
+    return results
+
+
+def mismatches(parsers, pages):
+    """
+    以 pyquery 的结果为准，统计每个后端结果不一致的网页数量。
+    """
+    expected = [parsers["pyquery"](page) for page in pages]
+    return {name: sum(parse(page) != result for page, result in zip(pages, expected))
+            for name, parse in parsers.items() if name != "pyquery"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="解析函数微基准测试")
+    parser.add_argument("--cache-dir", required=True, help="spider.py --cache-dir 录制下来的网页目录")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数，取最快的一次")
+    parser.add_argument("--save", default=None, help="把结果保存成 JSON，作为以后对比的基准")
+    parser.add_argument("--compare", default=None, help="和之前 --save 保存的结果对比")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许变慢的比例，超过就算回退")
+    parser.add_argument("--fields", type=lambda value: value.split(","), default=None,
+                        help="只解析这些字段（逗号分隔），对比 spider.py --fields 的效果；bs4 不支持")
+    args = parser.parse_args()
+    detail_parsers = DETAIL_PARSERS
+    if args.fields:
+        detail_parsers = {name: functools.partial(DETAIL_PARSERS[name], fields=args.fields)
+                          for name in ("pyquery", "lxml", "stream")}
+
+    index_pages, detail_pages = load_corpus(args.cache_dir)
+    if not index_pages or not detail_pages:
+        sys.exit(f"{args.cache_dir} needs both index and detail pages, record them with spider.py --cache-dir")
+    results = {}
+    for stage, parsers, pages in (("parse_index", INDEX_PARSERS, index_pages),
+                                  ("parse_details", detail_parsers, detail_pages)):
+        print(f"{stage}: {len(pages)} pages")
+        for name, ms in bench(parsers, pages, args.repeat).items():
+            results[f"{stage}/{name}"] = ms
+            print(f"  {name:<10}{ms:>10.3f} ms/page")
+        for name, count in mismatches(parsers, pages).items():
+            if count:
+                print(f"  {name} differs from pyquery on {count} pages")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = [key for key, ms in results.items()
+                       if key in baseline and ms > baseline[key] * (1 + args.tolerance)]
+        for key in regressions:
+            print(f"regression: {key} {baseline[key]:.3f} -> {results[key]:.3f} ms/page")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
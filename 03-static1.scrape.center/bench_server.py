@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# @Author  : AI悦创
+# @FileName: bench_server.py
+# @Software: PyCharm
+# @Blog    ：https://bornforthis.cn/
+# http.server
+"""
+本地的 static1.scrape.center 替身：
+1. 网页来自 spider.py --cache-dir 录制下来的缓存，按 URL 路径返回；
+1. Pages come from a cache recorded with spider.py --cache-dir and are served by URL path.
+2. 可以给每个请求加固定延迟和随机抖动，模拟真实网络；
+2. Each request can get a fixed latency plus random jitter to mimic a real network.
+3. 可以按比例返回 503，检验重试和自适应并发。
+3. A share of requests can fail with 503 to exercise retries and adaptive concurrency.
+
+录制：python spider.py --cache-dir recorded
+启动：python bench_server.py --cache-dir recorded --port 8000 --latency 0.05
+-------------------------------------------------
+"""
+import argparse
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from http_cache import ResponseCache
+
+
+def load_pages(cache_dir):
+    """
+    :return: {路径: 网页内容 bytes}
+    """
+    cache = ResponseCache(cache_dir)
+    pages = {}
+    for url in cache.urls():
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        pages[path] = cache.load(url).encode("utf-8")
+    return pages
+
+
+def make_handler(pages, latency=0.0, jitter=0.0, error_rate=0.0):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # 支持 keep-alive，和真实站点一样复用连接
+
+        def do_GET(self):
+            time.sleep(latency + random.uniform(0, jitter))
+            if random.random() < error_rate:
+                return self.reply(503, b"injected error")
+            body = pages.get(self.path)
+            if body is None:
+                return self.reply(404, b"not recorded")
+            self.reply(200, body)
+
+        def reply(self, status, body):
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_server(cache_dir, port=0, latency=0.0, jitter=0.0, error_rate=0.0):
+    """
+    在后台线程里启动服务器。
+    :param port: 0 表示随机选一个空闲端口
+    :return: (server, base_url)
+    """
+    pages = load_pages(cache_dir)
+    if not pages:
+        raise ValueError(f"no recorded pages in {cache_dir}, record them first with spider.py --cache-dir")
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(pages, latency, jitter, error_rate))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="bench-server", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def add_server_arguments(parser):
+    parser.add_argument("--cache-dir", required=True, help="spider.py --cache-dir 录制下来的网页目录")
+    parser.add_argument("--latency", type=float, default=0.05, help="每个请求固定的延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="在固定延迟上再加的随机延迟上限（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 503 的比例，0 到 1")
+    return parser
+
+
+def main():
+    parser = add_server_arguments(argparse.ArgumentParser(description="static1.scrape.center 本地替身"))
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    server, base_url = start_server(args.cache_dir, args.port, args.latency, args.jitter, args.error_rate)
+    print(f"serving {args.cache_dir} at {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+# @Author  : AI悦创
+# @FileName: decoding.py
+# @Software: PyCharm
+# @Blog    ：https://bornforthis.cn/
+# re、codecs
+"""
+响应的压缩协商和解码：
+1. 请求头里声明支持 gzip / deflate，装了 brotli 时再加上 br，网页在网络上传输的字节数更少；
+1. Requests advertise gzip / deflate, plus br when brotli is installed, so fewer bytes cross the wire.
+2. 按 Content-Type 里声明的 charset 解码，没有声明再看网页里的 <meta charset>，都没有才依次尝试 UTF-8、GB18030；
+2. Bodies are decoded with the charset from Content-Type, then <meta charset>, then UTF-8 and GB18030 in turn.
+3. 不再用 response.text：它在没有声明编码时会调用 chardet 逐字节猜编码，大网页上很慢。
+3. response.text is avoided because, without a declared charset, it runs chardet over the whole body, which is slow on large pages.
+-------------------------------------------------
+"""
+import codecs
+import re
+
+try:
+    import brotli  # noqa: F401  装了 brotli，urllib3 / aiohttp 才能解压 br
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+CHARSET = re.compile(r"charset\s*=\s*[\"']?([\w.:-]+)", re.I)
+META_CHARSET = re.compile(rb"<meta[^>]+charset\s*=\s*[\"']?([\w.:-]+)", re.I)
+FALLBACKS = ("utf-8", "gb18030")  # 没有声明编码时依次尝试，都失败就用 UTF-8 并替换非法字节
+
+
+def normalize(encoding):
+    """
+    :return: Python 里的标准编码名，比如 UTF8 -> utf-8；不认识的编码返回 None
+    """
+    try:
+        return codecs.lookup(encoding).name
+    except (LookupError, TypeError):
+        return None
+
+
+def declared_encoding(content, content_type=None):
+    """
+    :param content: 网页内容 bytes
+    :param content_type: 响应头里的 Content-Type
+    :return: 响应头或者网页 <meta> 里声明的编码，都没有声明时返回 None
+    """
+    match = CHARSET.search(content_type or "")
+    if match and normalize(match.group(1)):
+        return normalize(match.group(1))
+    # <meta charset> 一般在 <head> 的最前面，只看开头一段
+    match = META_CHARSET.search(content[:2048])
+    if match:
+        return normalize(match.group(1).decode("ascii"))
+    return None
+
+
+def decode(content, content_type=None):
+    """
+    :return: (网页文本, 实际使用的编码)
+    """
+    encoding = declared_encoding(content, content_type)
+    if encoding:
+        return content.decode(encoding, errors="replace"), encoding
+    for encoding in FALLBACKS:
+        try:
+            return content.decode(encoding), encoding
+        except UnicodeDecodeError:
+            continue
+    return content.decode(FALLBACKS[0], errors="replace"), FALLBACKS[0]
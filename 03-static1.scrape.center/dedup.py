@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+# @Author  : AI悦创
+# @FileName: dedup.py
+# @Software: PyCharm
+# @Blog    ：https://bornforthis.cn/
+"""
+详情页 URL 去重：
+1. canonicalize_url 把写法不同但指向同一个网页的 URL 统一成一种写法；
+1. canonicalize_url rewrites different spellings of the same page into one form.
+2. SeenSet 用普通 set 精确去重，适合小规模爬取；
+2. SeenSet dedups exactly with a plain set, fine for small crawls.
+3. BloomFilter 固定占用 bit 数组的内存，上百万 URL 也只要几 MB，代价是极小概率把新 URL 误判为见过；
+3. BloomFilter uses a fixed-size bit array, a few MB for millions of URLs, at the cost of rare false positives.
+4. SharedSeenSet 存在 SQLite 文件里，多进程模式下所有进程共用一个。
+4. SharedSeenSet lives in an SQLite file so every process of a --workers crawl shares it.
+-------------------------------------------------
+"""
+import hashlib
+import math
+import posixpath
+import sqlite3
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonicalize_url(url):
+    """
+    HTTPS://Static1.scrape.center:443/detail/1/?b=2&a=1#top >>> https://static1.scrape.center/detail/1?a=1&b=2
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = posixpath.normpath(parts.path) if parts.path else "/"
+    if path == ".":
+        path = "/"
+    if path.startswith("//"):  # normpath 会保留开头的两个斜杠
+        path = "/" + path.lstrip("/")
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+class SeenSet(object):
+    def __init__(self):
+        self.seen = set()
+        self.lock = threading.Lock()
+
+    def add(self, url):
+        """
+        :return: True 表示第一次见到这个 URL
+        """
+        with self.lock:
+            if url in self.seen:
+                return False
+            self.seen.add(url)
+            return True
+
+    def __len__(self):
+        return len(self.seen)
+
+
+class BloomFilter(object):
+    def __init__(self, capacity=1000000, error_rate=0.001):
+        """
+        :param capacity: 预计的 URL 数量
+        :param error_rate: 达到预计数量时，新 URL 被误判为见过的概率
+        """
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)  # bit 数
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))  # 哈希函数个数
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def positions(self, url):
+        # 一次 blake2b 拆成两个 64 位整数，用双重哈希模拟 k 个哈希函数
+        digest = hashlib.blake2b(url.encode("utf-8"), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, url):
+        """
+        :return: True 表示第一次见到这个 URL（有 error_rate 的概率把新 URL 当成见过）
+        """
+        new = False
+        with self.lock:
+            for position in self.positions(url):
+                byte, bit = divmod(position, 8)
+                if not self.bits[byte] & (1 << bit):
+                    self.bits[byte] |= 1 << bit
+                    new = True
+            if new:
+                self.count += 1
+        return new
+
+    def __len__(self):
+        return self.count
+
+
+class SharedSeenSet(object):
+    def __init__(self, path):
+        """
+        :param path: SQLite 文件路径，每个进程各自打开同一个文件
+        """
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS seen (url TEXT PRIMARY KEY)")
+
+    def add(self, url):
+        """
+        :return: True 表示第一次见到这个 URL；INSERT OR IGNORE 是原子的，同一个 URL 只有一个进程能加进去
+        """
+        with self.lock:
+            cursor = self.connection.execute("INSERT OR IGNORE INTO seen (url) VALUES (?)", (url,))
+        return cursor.rowcount == 1
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+
+
+def make_seen_set(kind="exact", capacity=1000000, error_rate=0.001):
+    if kind == "bloom":
+        return BloomFilter(capacity, error_rate)
+    if kind == "exact":
+        return SeenSet()
+    raise ValueError(f"unknown seen set {kind!r}, choose from ['bloom', 'exact']")
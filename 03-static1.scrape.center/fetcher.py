@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# @Author  : AI悦创
+# @FileName: fetcher.py
+# @Software: PyCharm
+# @Blog    ：https://bornforthis.cn/
+# requests、连接池
+"""
+和具体站点无关的抓取运行时，base_spider.Spider 用它发请求：
+1. 每个 Fetcher 有自己的 Session，连接池大小和抓取线程数一致，每个线程都能复用 keep-alive 连接；
+1. Every Fetcher owns its Session, with a pool sized to the fetch threads so each thread can reuse keep-alive connections.
+2. 失败按 retry.RetryPolicy 重试，可以按域名限速（rate_limit.HostRateLimiter），按 decoding.decode 解码；
+2. Failures are retried through retry.RetryPolicy, requests can be rate limited per host, bodies are decoded with decoding.decode.
+3. 不读 spider.py 的全局配置，导入时也不会配置日志、连接 MongoDB。
+3. Nothing here touches spider.py's globals, and importing it neither configures logging nor connects to MongoDB.
+-------------------------------------------------
+"""
+import logging
+import time
+
+import requests
+from requests.adapters import HTTPAdapter  # 连接池
+
+from decoding import ACCEPT_ENCODING, decode
+from rate_limit import HostRateLimiter
+from retry import RetryPolicy
+
+POOL_SIZE = 10  # 连接池大小
+
+
+def create_session(pool_size=POOL_SIZE):
+    """
+    创建一个带连接池的 Session，同一个站点的请求复用 keep-alive 连接，省去每次的 TCP + TLS 握手。
+    :param pool_size: 连接池大小，一般和并发数保持一致
+    :return: requests.Session
+    """
+    session = requests.Session()
+    # 明确声明支持的压缩格式，装了 brotli 时包括 br
+    session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class Fetcher(object):
+    def __init__(self, pool_size=POOL_SIZE, headers=None, retries=2, backoff=0.5, rate=None, burst=1):
+        """
+        :param pool_size: 连接池大小，和抓取线程数保持一致
+        :param headers: 每个请求都带上的请求头，比如 User-Agent；只加在自己的 Session 上
+        :param retries: 请求失败（网络异常、429、5xx）后的重试次数
+        :param backoff: 第一次重试前的基准等待秒数
+        :param rate: 每个域名每秒最多请求数，None 表示不限速
+        :param burst: 限速时允许的突发请求数
+        """
+        self.session = create_session(pool_size)
+        self.session.headers.update(headers or {})
+        self.retry = RetryPolicy(retries=retries, backoff=backoff)
+        self.rate_limiter = HostRateLimiter(rate, burst) if rate else None
+
+    def get(self, url):
+        """
+        :return: 解码后的 HTML，失败时返回 None
+        """
+        for attempt in range(self.retry.retries + 1):
+            status, retry_after = None, None
+            if self.rate_limiter:
+                self.rate_limiter.wait(url)
+            try:
+                response = self.session.get(url)
+                status = response.status_code
+                if status == 200:
+                    html, _ = decode(response.content, response.headers.get("Content-Type"))
+                    return html
+                retry_after = response.headers.get("Retry-After")
+                logging.error("get invalid status code %s while scraping %s", status, url)
+            except requests.RequestException:
+                logging.error("error occurred while scraping %s", url, exc_info=True)
+            if not self.retry.should_retry(attempt, status):
+                return None
+            delay = self.retry.delay(attempt, retry_after)
+            logging.warning("retry %s in %.1fs (%s/%s)", url, delay, attempt + 1, self.retry.retries)
+            time.sleep(delay)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# @Author  : AI悦创
+# @FileName: frontier.py
+# @Software: PyCharm
+# @Blog    ：https://bornforthis.cn/
+# sqlite3
+"""
+持久化的爬取队列（frontier）：
+1. 用 SQLite 记录每个 URL 的状态：queued（待爬）、in_flight（正在爬）、done（已完成）；
+1. SQLite records every URL as queued, in_flight or done.
+2. 程序中途崩溃后加上 --resume 重新运行，已完成的网页不再爬取，没完成的接着爬；
+2. After a crash, re-running with --resume skips completed pages and picks up the unfinished ones.
+3. 详情页只有在数据真正写入 MongoDB 之后才会标记为完成。
+3. A detail page is only marked done once its record has actually been written to MongoDB.
+-------------------------------------------------
+"""
+import sqlite3
+import threading
+import time
+
+QUEUED = "queued"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+
+
+class Frontier(object):
+    def __init__(self, path):
+        """
+        :param path: SQLite 文件路径，多进程模式下每个进程各自打开同一个文件
+        """
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            "url TEXT PRIMARY KEY, kind TEXT NOT NULL, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def reset(self):
+        """
+        不续爬时，清空上次的记录。
+        """
+        with self.lock:
+            self.connection.execute("DELETE FROM urls")
+            self.connection.execute("DELETE FROM meta")
+
+    def requeue(self):
+        """
+        续爬时，上次崩溃时正在爬的 URL 当作没爬过。
+        """
+        with self.lock:
+            self.connection.execute("UPDATE urls SET state = ? WHERE state = ?", (QUEUED, IN_FLIGHT))
+
+    def add(self, url, kind="detail"):
+        """
+        把 URL 放进队列。
+        :return: True 表示这是一个新 URL；之前已经记录过的（不管爬没爬完）返回 False
+        """
+        with self.lock:
+            cursor = self.connection.execute(
+                "INSERT OR IGNORE INTO urls (url, kind, state, updated_at) VALUES (?, ?, ?, ?)",
+                (url, kind, QUEUED, time.time()),
+            )
+        return cursor.rowcount == 1
+
+    def is_done(self, url):
+        with self.lock:
+            row = self.connection.execute("SELECT state FROM urls WHERE url = ?", (url,)).fetchone()
+        return row is not None and row[0] == DONE
+
+    def start(self, url, kind="detail"):
+        self._set(url, kind, IN_FLIGHT)
+
+    def done(self, url, kind="detail"):
+        self._set(url, kind, DONE)
+
+    def pending(self, kind="detail"):
+        """
+        :return: 记录过但还没完成的 URL，续爬时先把它们爬掉
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT url FROM urls WHERE kind = ? AND state != ? ORDER BY updated_at", (kind, DONE)
+            ).fetchall()
+        return [url for url, in rows]
+
+    def get(self, key, default=None):
+        with self.lock:
+            row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set(self, key, value):
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def counts(self):
+        with self.lock:
+            return dict(self.connection.execute("SELECT state, COUNT(*) FROM urls GROUP BY state").fetchall())
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def _set(self, url, kind, state):
+        with self.lock:
+            self.connection.execute(
+                "INSERT INTO urls (url, kind, state, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+                (url, kind, state, time.time()),
+            )
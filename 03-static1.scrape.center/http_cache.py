@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# @Author  : AI悦创
+# @FileName: http_cache.py
+# @Software: PyCharm
+# @Blog    ：https://bornforthis.cn/
+"""
+磁盘上的 HTTP 响应缓存：
+1. 以 URL 为 key，保存网页内容以及 ETag / Last-Modified；
+1. Responses are stored on disk keyed by URL, together with their ETag / Last-Modified headers.
+2. 再次爬取时带上 If-None-Match / If-Modified-Since，服务器返回 304 就直接用磁盘上的内容；
+2. Re-crawls send If-None-Match / If-Modified-Since and reuse the stored body when the server answers 304.
+3. 离线模式下完全不发请求，方便反复调试解析代码。
+3. In offline mode no request is sent at all, which is handy when working on the parsers.
+-------------------------------------------------
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+class ResponseCache(object):
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, url, suffix):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key + suffix)
+
+    def meta(self, url):
+        """
+        :return: {"url", "etag", "last_modified", "encoding", "stored_at"}，没有缓存时返回 None
+        """
+        try:
+            with open(self.path(url, ".json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load(self, url):
+        """
+        :return: 缓存的网页内容 >>> HTML，没有缓存时返回 None
+        """
+        meta = self.meta(url)
+        if meta is None:
+            return None
+        try:
+            with open(self.path(url, ".html"), "rb") as f:
+                content = f.read()
+        except OSError:
+            return None
+        return content.decode(meta.get("encoding") or "utf-8", errors="replace")
+
+    def conditional_headers(self, url):
+        """
+        根据缓存构造条件请求头，服务器判断内容没变时只返回 304，不再传输网页内容。
+        """
+        meta = self.meta(url) or {}
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def store(self, url, response):
+        """
+        :param response: 状态码为 200 的 requests.Response
+        """
+        meta = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "encoding": response.encoding,
+            "stored_at": time.time(),
+        }
+        # 先写内容再写元数据，元数据存在就说明内容是完整的
+        self._write(self.path(url, ".html"), response.content)
+        self._write(self.path(url, ".json"), json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+    def urls(self):
+        """
+        遍历缓存里所有的 URL，方便离线回放。
+        """
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(".json"):
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    yield json.load(f)["url"]
+
+    @staticmethod
+    def _write(path, content):
+        # 写到临时文件再替换，多个进程、线程同时写也不会读到一半的文件
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+# @Author  : AI悦创
+# @FileName: images.py
+# @Software: PyCharm
+# @Blog    ：https://bornforthis.cn/
+# requests、concurrent.futures、hashlib
+"""
+电影封面下载：
+1. 线程池并发下载，stream=True 边下载边写文件，图片再大也不会整张读进内存；
+1. Covers are downloaded by a thread pool with stream=True, so an image is never held in memory as a whole.
+2. 文件名是图片内容的 sha256，同一张图片只保存一份；
+2. Files are named by the sha256 of their content, so identical images are stored once.
+3. index.tsv 记录 URL 和文件名的对应关系，下载过的 URL 不再重复下载。
+3. index.tsv maps URLs to file names so a URL that was already downloaded is skipped.
+-------------------------------------------------
+"""
+import hashlib
+import logging
+import mimetypes
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+
+CHUNK_SIZE = 64 * 1024
+INDEX_NAME = "index.tsv"
+
+
+class CoverDownloader(object):
+    def __init__(self, directory, session=None, workers=8, chunk_size=CHUNK_SIZE):
+        """
+        :param directory: 图片保存目录
+        :param session: 复用的 requests.Session，不传就新建一个
+        :param workers: 下载线程数
+        """
+        self.directory = directory
+        self.session = session or requests.Session()
+        self.chunk_size = chunk_size
+        os.makedirs(directory, exist_ok=True)
+        self.index_path = os.path.join(directory, INDEX_NAME)
+        self.index = self.load_index()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cover")
+        self.futures = set()
+
+    def load_index(self):
+        index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding="utf-8") as f:
+                for line in f:
+                    url, _, filename = line.rstrip("\n").partition("\t")
+                    if filename and os.path.exists(os.path.join(self.directory, filename)):
+                        index[url] = filename
+        return index
+
+    def submit(self, url):
+        """
+        把一张封面放进下载队列，已经下载过或正在下载的直接跳过。
+        """
+        with self.lock:
+            if not url or url in self.index:
+                return
+            self.index[url] = None  # 占位，避免同一个 URL 被提交两次
+            self.futures.add(self.executor.submit(self.download, url))
+
+    def download(self, url):
+        tmp_path = os.path.join(self.directory, f".{os.getpid()}.{threading.get_ident()}.tmp")
+        digest = hashlib.sha256()
+        try:
+            with self.session.get(url, stream=True, timeout=30) as response:
+                if response.status_code != 200:
+                    logging.error("get invalid status code %s while downloading %s", response.status_code, url)
+                    return self.forget(url)
+                content_type = response.headers.get("Content-Type", "").split(";")[0].strip()
+                with open(tmp_path, "wb") as f:
+                    for chunk in response.iter_content(self.chunk_size):
+                        f.write(chunk)
+                        digest.update(chunk)
+        except (requests.RequestException, OSError):
+            logging.error("error occurred while downloading %s", url, exc_info=True)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return self.forget(url)
+        filename = digest.hexdigest() + (mimetypes.guess_extension(content_type) or "")
+        path = os.path.join(self.directory, filename)
+        if os.path.exists(path):
+            os.remove(tmp_path)  # 内容相同的图片已经存在
+        else:
+            os.replace(tmp_path, path)
+        with self.lock:
+            self.index[url] = filename
+            # 一行很短，追加写入在多个进程之间也不会互相打断
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(f"{url}\t{filename}\n")
+        return filename
+
+    def forget(self, url):
+        with self.lock:
+            self.index.pop(url, None)
+
+    def join(self):
+        """
+        等待已经提交的下载全部完成。
+        """
+        with self.lock:
+            futures, self.futures = self.futures, set()
+        wait(futures)
+
+    def close(self):
+        self.join()
+        self.executor.shutdown()
@@ -1,7 +1,34 @@
 # 数据存储函数，Mongodb
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
 import pymongo
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
 from faker import Faker
 import random
+MONGO_URI = "mongodb://localhost:27017/"
+CLIENTS = {}  # (连接地址, 进程号) -> MongoClient
+CLIENTS_LOCK = threading.Lock()
+
+
+def get_client(uri=MONGO_URI):
+    """
+    按连接地址缓存 MongoClient：同一个进程里反复调用拿到的是同一个客户端，
+    不会每写一条数据就重新建立连接、再启动一遍监控线程。
+    MongoClient 不能跨 fork 使用，所以缓存的 key 里带上了进程号，子进程会自动创建自己的客户端。
+    """
+    key = (uri, os.getpid())
+    with CLIENTS_LOCK:
+        client = CLIENTS.get(key)
+        if client is None:
+            client = CLIENTS[key] = pymongo.MongoClient(uri)
+    return client
+
+
 def judge(insert_data, collection):
     if isinstance(insert_data, list):
         collection.insert_many(insert_data)
@@ -10,9 +37,9 @@ def judge(insert_data, collection):
     else:
         print("插入的数据不支持，函数：judge！")
 
-def write_mongodb(db_name="default_db", table_name="default_table", insert_data="None"):
+def write_mongodb(db_name="default_db", table_name="default_table", insert_data="None", uri=MONGO_URI):
     print("正在连接数据库...")
-    client = pymongo.MongoClient(host="localhost", port=27017)
+    client = get_client(uri)
     print("连接成功!")
     # client = pymongo.MongoClient("mongodb://localhost:27017/")
     # db = client.test
@@ -28,6 +55,142 @@ def write_mongodb(db_name="default_db", table_name="default_table", insert_data=
     judge(insert_data, collection)
     print("插入成功!")
 
+def record_hash(data, ignore=()):
+    """
+    计算一条数据内容的哈希，字段顺序不同也得到同样的结果。
+    :param ignore: 不参与计算的字段，比如每次都会变的爬取时间
+    """
+    content = {key: value for key, value in data.items() if key not in ignore and key != "_id"}
+    text = json.dumps(content, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class BulkWriter(object):
+    """
+    批量写入：先把数据攒在内存里，够 batch_size 条或者距离上次写入超过 flush_interval 秒，
+    就用一次 bulk_write 把所有 upsert 发给 MongoDB，N 条数据只需要 N / batch_size 次往返。
+    on_flush(records) 会在一批数据真正写入之后被调用，参数是写入成功的那些数据；
+    on_error(records) 的参数是写入失败的那些数据，比如把它们的 URL 放回队列重试。
+    传入 hashes（key -> 内容哈希）后，内容没有变化的数据不再整条写入：
+    只更新 touch 里的字段，touch 为空就完全跳过。
+    """
+
+    def __init__(self, collection, key="name", batch_size=100, flush_interval=5.0, on_flush=None,
+                 on_error=None, hashes=None, volatile=(), touch=(), metrics=None):
+        """
+        :param hashes: 数据库里已有数据的内容哈希 {key: content_hash}，None 表示不做变化检测
+        :param volatile: 不参与哈希计算的字段
+        :param touch: 内容没变时仍然要更新的字段
+        :param metrics: metrics.Metrics，记录每次 bulk_write 的耗时
+        """
+        self.collection = collection
+        self.key = key
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self.on_error = on_error
+        self.hashes = hashes
+        self.volatile = set(volatile) | {"content_hash"}
+        self.touch = touch
+        self.metrics = metrics
+        self.operations = []
+        self.records = []
+        self.lock = threading.Lock()
+        self.last_flush = time.monotonic()
+        # 数据来得慢的时候，由后台线程按时间把缓存刷进去
+        self.closed = threading.Event()
+        self.timer = threading.Thread(target=self._flush_periodically, daemon=True)
+        self.timer.start()
+
+    def add(self, data):
+        operation = self.operation(data)
+        if operation is None:
+            # 内容没变，什么都不用写，直接当作写入成功
+            if self.on_flush:
+                self.on_flush([data])
+            return
+        with self.lock:
+            self.operations.append(operation)
+            self.records.append(data)
+            if len(self.operations) < self.batch_size:
+                return
+            batch = self._take()
+        self._write(*batch)
+
+    def operation(self, data):
+        key = data.get(self.key)
+        # 写入的是此刻数据的副本：调用方之后再改 data（比如 insert_one 往里面加 _id）不会混进这次 $set，
+        # 而 $set 里带上 _id 会让已有的记录报 "immutable field _id" 错误
+        data = {field: value for field, value in data.items() if field != "_id"}
+        if self.hashes is None:
+            return UpdateOne({self.key: key}, {"$set": data}, upsert=True)
+        content_hash = record_hash(data, self.volatile)
+        if self.hashes.get(key) == content_hash:
+            if not self.touch:
+                return None
+            return UpdateOne({self.key: key}, {"$set": {field: data[field] for field in self.touch if field in data}})
+        # self.hashes 等写入成功以后再在 _write 里更新，写入失败的数据下次还要重写
+        return UpdateOne({self.key: key}, {"$set": dict(data, content_hash=content_hash)}, upsert=True)
+
+    def flush(self):
+        with self.lock:
+            batch = self._take()
+        self._write(*batch)
+
+    def close(self):
+        self.closed.set()
+        self.timer.join()
+        self.flush()
+
+    def _take(self):
+        batch = self.operations, self.records
+        self.operations, self.records = [], []
+        self.last_flush = time.monotonic()
+        return batch
+
+    def _write(self, operations, records):
+        if not operations:
+            return
+        start, failed = time.monotonic(), []
+        try:
+            # ordered=False：某一条失败不影响其它条继续写入
+            self.collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            logging.error("bulk write failed: %s", errors)
+            indexes = {error["index"] for error in errors}
+            failed = [data for index, data in enumerate(records) if index in indexes]
+            records = [data for index, data in enumerate(records) if index not in indexes]
+        except PyMongoError:
+            # 连接断开、超时之类的错误，这一批全部算作失败
+            logging.error("bulk write of %s records failed", len(records), exc_info=True)
+            failed, records = records, []
+        finally:
+            if self.metrics:
+                self.metrics.record("save_data", time.monotonic() - start, error=bool(failed))
+        if self.hashes is not None:
+            for data in records:
+                self.hashes[data.get(self.key)] = record_hash(data, self.volatile)
+        if self.on_flush and records:
+            self.on_flush(records)
+        if self.on_error and failed:
+            self.on_error(failed)
+
+    def _flush_periodically(self):
+        while not self.closed.wait(self.flush_interval):
+            with self.lock:
+                if time.monotonic() - self.last_flush < self.flush_interval:
+                    continue
+                batch = self._take()
+            self._write(*batch)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
 def generate_data():
     """数据生成，便于测试"""
     faker = Faker()
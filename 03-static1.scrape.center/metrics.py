@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+# @Author  : AI悦创
+# @FileName: metrics.py
+# @Software: PyCharm
+# @Blog    ：https://bornforthis.cn/
+# threading、http.server
+"""
+爬虫运行指标：
+1. 统计 scrape_page、parse_index、parse_details、save_data 各阶段的次数、字节数和耗时分布（p50/p95/p99）；
+1. Records counts, bytes and latency percentiles (p50/p95/p99) for scrape_page, parse_index, parse_details and save_data.
+2. 爬取结束时打印一张汇总表，一眼看出时间花在网络、解析还是 MongoDB 上；
+2. Prints a summary table at the end showing whether time went to the network, parsing or MongoDB.
+3. 可选地开一个 HTTP 端口，以 Prometheus 文本格式暴露实时指标。
+3. Optionally serves live metrics in the Prometheus text format over HTTP.
+-------------------------------------------------
+"""
+import functools
+import inspect
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Prometheus 直方图的桶（秒）
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_SAMPLES = 10000  # 每个阶段最多保留的耗时样本数，用来算分位数
+
+
+def percentile(values, q):
+    """
+    :param values: 已经排好序的耗时列表
+    :param q: 0 到 100
+    """
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(q / 100 * len(values)) - 1))
+    return values[index]
+
+
+class StageStats(object):
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.bytes = 0
+        self.total = 0.0
+        self.latencies = []
+        self.buckets = [0] * len(BUCKETS)
+
+    def record(self, latency, size=0, error=False):
+        self.count += 1
+        self.errors += error
+        self.bytes += size
+        self.total += latency
+        # 蓄水池抽样：样本数封顶，内存不会随爬取时间一直增长，分位数仍然是对全部请求的无偏估计
+        if len(self.latencies) < MAX_SAMPLES:
+            self.latencies.append(latency)
+        else:
+            index = random.randrange(self.count)
+            if index < MAX_SAMPLES:
+                self.latencies[index] = latency
+        for i, bound in enumerate(BUCKETS):
+            if latency <= bound:
+                self.buckets[i] += 1
+
+
+class Metrics(object):
+    def __init__(self):
+        self.stages = {}
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+
+    def record(self, stage, latency, size=0, error=False):
+        with self.lock:
+            self.stages.setdefault(stage, StageStats()).record(latency, size, error)
+
+    def timed(self, stage, size=None):
+        """
+        装饰器：统计函数每次调用的耗时。
+        :param size: 从返回值计算字节数的函数，比如 scrape_page 返回的 HTML 长度
+        生成器函数（如 parse_index）统计的是它自己产出所有结果花的时间。
+        """
+
+        def decorator(func):
+            if inspect.isgeneratorfunction(func):
+                @functools.wraps(func)
+                def generator_wrapper(*args, **kwargs):
+                    # 只累计生成器自己运行的时间，不包括调用方处理每个结果的时间
+                    iterator, elapsed, error = func(*args, **kwargs), 0.0, False
+                    try:
+                        while True:
+                            start = time.monotonic()
+                            try:
+                                item = next(iterator)
+                            except StopIteration:
+                                return
+                            except Exception:
+                                error = True
+                                raise
+                            finally:
+                                elapsed += time.monotonic() - start
+                            yield item
+                    finally:
+                        self.record(stage, elapsed, error=error)
+
+                return generator_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start, result, error = time.monotonic(), None, True
+                try:
+                    result = func(*args, **kwargs)
+                    error = False
+                    return result
+                finally:
+                    self.record(stage, time.monotonic() - start,
+                                size(result) if size and result is not None else 0, error)
+
+            return wrapper
+
+        return decorator
+
+    def drain(self):
+        """
+        取出目前为止的统计并清空，多进程模式下子进程把它交给主进程合并。
+        """
+        with self.lock:
+            stages, self.stages = self.stages, {}
+        return stages
+
+    def merge(self, stages):
+        with self.lock:
+            for name, other in stages.items():
+                stats = self.stages.setdefault(name, StageStats())
+                stats.count += other.count
+                stats.errors += other.errors
+                stats.bytes += other.bytes
+                stats.total += other.total
+                stats.latencies.extend(other.latencies)
+                if len(stats.latencies) > MAX_SAMPLES:
+                    stats.latencies = random.sample(stats.latencies, MAX_SAMPLES)
+                stats.buckets = [a + b for a, b in zip(stats.buckets, other.buckets)]
+
+    def summary(self):
+        """
+        :return: 汇总表的文本
+        """
+        elapsed = time.monotonic() - self.started
+        lines = [f"crawl finished in {elapsed:.2f}s",
+                 f"{'stage':<14}{'count':>8}{'errors':>8}{'MB':>10}{'total s':>10}"
+                 f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+        with self.lock:
+            for name, stats in sorted(self.stages.items()):
+                latencies = sorted(stats.latencies)
+                lines.append(
+                    f"{name:<14}{stats.count:>8}{stats.errors:>8}{stats.bytes / 1e6:>10.2f}{stats.total:>10.2f}"
+                    f"{percentile(latencies, 50) * 1000:>10.1f}{percentile(latencies, 95) * 1000:>10.1f}"
+                    f"{percentile(latencies, 99) * 1000:>10.1f}"
+                )
+        return "\n".join(lines)
+
+    def prometheus(self):
+        """
+        :return: Prometheus 文本格式的指标
+        """
+        lines = [
+            "# HELP spider_stage_seconds Time spent in each crawler stage.",
+            "# TYPE spider_stage_seconds histogram",
+        ]
+        with self.lock:
+            for name, stats in sorted(self.stages.items()):
+                for bound, count in zip(BUCKETS, stats.buckets):
+                    lines.append(f'spider_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {count}')
+                lines.append(f'spider_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {stats.count}')
+                lines.append(f'spider_stage_seconds_sum{{stage="{name}"}} {stats.total}')
+                lines.append(f'spider_stage_seconds_count{{stage="{name}"}} {stats.count}')
+            lines.append("# HELP spider_stage_errors_total Failed calls of each crawler stage.")
+            lines.append("# TYPE spider_stage_errors_total counter")
+            for name, stats in sorted(self.stages.items()):
+                lines.append(f'spider_stage_errors_total{{stage="{name}"}} {stats.errors}')
+            lines.append("# HELP spider_stage_bytes_total Bytes handled by each crawler stage.")
+            lines.append("# TYPE spider_stage_bytes_total counter")
+            for name, stats in sorted(self.stages.items()):
+                lines.append(f'spider_stage_bytes_total{{stage="{name}"}} {stats.bytes}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port):
+        """
+        在后台线程里启动 HTTP 服务，访问 http://localhost:<port>/metrics 查看指标。
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(("", port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+        return server
+
+
+METRICS = Metrics()  # 当前进程的指标
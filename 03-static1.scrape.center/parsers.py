@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+# @Author  : AI悦创
+# @FileName: parsers.py
+# @Software: PyCharm
+# @Blog    ：https://bornforthis.cn/
+# lxml、XPath、cssselect
+"""
+详情页解析的 lxml 后端：
+1. 字段用 DETAIL_FIELDS 声明（CSS 选择器 + 后处理），选择器在导入时就编译成 XPath，每个网页只建一次 lxml 树；
+1. Fields are declared in DETAIL_FIELDS (CSS selector + post-processor); selectors are compiled to XPath at import and each page builds a single lxml tree.
+2. spider.py 的 pyquery 版本也按 DETAIL_FIELDS 提取，两者结果完全一致，可以通过 --parser lxml 切换；
+2. The pyquery version in spider.py is driven by DETAIL_FIELDS as well, so both return the same dict; select this one with --parser lxml.
+3. 两个后端都来自 DETAIL_FIELDS，所以对比的标准是原来手写的 pyquery 版本 parse_details_reference，
+   字段声明写错了也能发现：python parsers.py --cache-dir <缓存目录>
+3. Both backends come from DETAIL_FIELDS, so they are checked against the original hand-written pyquery
+   parse_details_reference, which also catches a wrongly declared field: python parsers.py --cache-dir <cache dir>
+-------------------------------------------------
+"""
+import argparse
+import math
+import re
+import sys
+import threading
+from cssselect import HTMLTranslator, parse
+from lxml import etree, html as lxml_html
+
+# 和 pyquery 的 text() 一样，只合并这些空白字符
+WHITESPACE = re.compile("[\x20\x09\x0C\u200B\x0A\x0D]+")
+DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+DIGITS = re.compile(r"\d+")
+TRANSLATOR = HTMLTranslator()
+
+
+class SelfTranslator(HTMLTranslator):
+    """
+    把 CSS 选择器翻译成只判断元素本身的 XPath：A B → B[ancestor::A]，A > B → B[parent::A]。
+    这样遍历一次树，就能判断每个元素属于哪个字段。
+    """
+
+    def xpath_descendant_combinator(self, left, right):
+        return right.add_condition(f"ancestor::{left}")
+
+    def xpath_child_combinator(self, left, right):
+        return right.add_condition(f"parent::{left}")
+
+
+SELF_TRANSLATOR = SelfTranslator()
+LOCAL = threading.local()  # lxml 的解析器不能在线程之间共用，每个线程一个
+
+
+# 取值方式：从选择器选中的元素里取出原始值
+def text(elements):
+    """
+    与 pyquery 的 .text() 相同：每个元素的文字去掉多余空白后，用空格拼起来。
+    """
+    texts = (WHITESPACE.sub(" ", element.text_content()).strip() for element in elements)
+    return " ".join(item for item in texts if item)
+
+
+def texts(elements):
+    return [text([element]) for element in elements]
+
+
+def hrefs(elements):
+    return [element.get("href") for element in elements]
+
+
+def attr(name):
+    def extract(elements):
+        return elements[0].get(name) if elements else None
+
+    return extract
+
+
+# 后处理：把原始值转换成最终存储的类型
+def to_date(value):
+    """
+    1993-07-26 上映 >>> 1993-07-26
+    """
+    match = DATE.search(value) if value else None
+    return match.group() if match else None
+
+
+def to_float(value):
+    return float(value) if value else None
+
+
+class Field(object):
+    """
+    一个字段的声明：CSS 选择器 + 取值方式 + 后处理。
+    选择器在创建时就翻译成 XPath 并编译，解析网页时不再重复这一步。
+    scope 是包住这个字段的元素（只能是不带空格、> 的简单选择器），
+    边下载边解析时它一闭合，这个字段的值就确定了，见 streaming.py。
+    """
+
+    def __init__(self, name, selector, extract=text, post=None, scope=None):
+        self.name = name
+        self.selector = selector
+        self.xpath = etree.XPath(TRANSLATOR.css_to_xpath(selector))
+        self.extract = extract
+        self.post = post
+        # 只判断元素本身是否匹配选择器，extract_fields 遍历树时用；tag 用来先按标签名筛掉大部分元素
+        selectors = parse(selector)
+        self.tag = SELF_TRANSLATOR.xpath(selectors[0].parsed_tree).element if len(selectors) == 1 else "*"
+        self.match = etree.XPath(SELF_TRANSLATOR.css_to_xpath(selector, prefix="self::"))
+        # self:: 前缀：只判断元素本身是否匹配，不搜索它的子孙
+        self.scope = etree.XPath(TRANSLATOR.css_to_xpath(scope or selector, prefix="self::"))
+
+    def __call__(self, doc):
+        return self.value(self.xpath(doc))
+
+    def value(self, elements):
+        value = self.extract(elements)
+        return self.post(value) if self.post else value
+
+    def in_scope(self, element):
+        return bool(self.scope(element))
+
+
+# 详情页要提取的字段，新增字段只要在这里加一行
+DETAIL_FIELDS = [
+    Field("img_cover", "img.cover", attr("src")),  # 1. 电影图片
+    Field("name", "a > h2", scope="a"),  # 2. 电影名称
+    Field("categories", ".categories button span", texts, scope=".categories"),  # 3. 电影标签
+    Field("published_at", ".info:contains('上映')", post=to_date, scope=".info"),  # 4. 上映时间
+    Field("drama", ".drama p", scope=".drama"),  # 5. 剧情简介
+    Field("score", "p.score", post=to_float),  # 6. 评分
+]
+
+
+FIELD_NAMES = [field.name for field in DETAIL_FIELDS]
+
+# 索引页：详情页链接（每张 .el-card 里一个）和分页器
+INDEX_LINKS = Field("links", ".el-card .name", hrefs, scope=".el-card")
+PAGER_NUMBERS = Field("numbers", ".el-pager li.number", texts, scope=".el-pager")
+PAGER_TOTAL = Field("total", ".el-pagination__total", text)
+
+
+def select_fields(names=None):
+    """
+    :param names: 需要的字段名，None 表示全部
+    :return: DETAIL_FIELDS 里对应的字段，保持声明的顺序
+    """
+    if names is None:
+        return DETAIL_FIELDS
+    unknown = set(names) - set(FIELD_NAMES)
+    if unknown:
+        raise ValueError(f"unknown fields {sorted(unknown)}, choose from {FIELD_NAMES}")
+    return [field for field in DETAIL_FIELDS if field.name in names]
+
+
+def extract_fields(doc, fields):
+    """
+    只遍历一次 lxml 树，把每个元素分给它匹配的字段，字段再多也不会多扫描几遍整棵树。
+    """
+    by_tag, matches = {}, {field.name: [] for field in fields}
+    for field in fields:
+        by_tag.setdefault(field.tag, []).append(field)
+    anywhere = by_tag.pop("*", [])
+    for element in doc.iter(etree.Element):
+        for field in by_tag.get(element.tag, []) + anywhere:
+            if field.match(element):
+                matches[field.name].append(element)
+    return {field.name: field.value(matches[field.name]) for field in fields}
+
+
+def build_tree(html):
+    """
+    :param html: 网页文本；也可以是 UTF-8 编码的 bytes（spider.py --raw-bytes），省掉一次解码
+    """
+    if isinstance(html, bytes):
+        if not hasattr(LOCAL, "parser"):
+            LOCAL.parser = lxml_html.HTMLParser(encoding="utf-8")
+        return lxml_html.fromstring(html, parser=LOCAL.parser)
+    return lxml_html.fromstring(html)
+
+
+def count_pages(numbers, total, per_page):
+    """
+    优先看页码按钮里最大的数字，没有的话用 "共 100 条" 除以每页的电影数量。
+    :param numbers: 页码按钮上的文字
+    :param total: 分页器里 "共 100 条" 的文字
+    :param per_page: 这一页的电影数量
+    :return: 总页数，读不到时返回 None
+    """
+    numbers = [int(number) for number in numbers if number.isdigit()]
+    if numbers:
+        return max(numbers)
+    total = DIGITS.search(total or "")
+    if total and per_page:
+        return math.ceil(int(total.group()) / per_page)
+    return None
+
+
+def parse_total_page(html):
+    """
+    从索引页的分页器里读出总页数，读不到时返回 None。
+    """
+    doc = build_tree(html)
+    return count_pages(PAGER_NUMBERS(doc), PAGER_TOTAL(doc), len(INDEX_LINKS(doc)))
+
+
+def parse_details_lxml(html, fields=None):
+    """
+    :param fields: 只提取这些字段，None 表示全部；没用到的 XPath 不会执行
+    """
+    return extract_fields(build_tree(html), select_fields(fields))
+
+
+def parse_details_reference(html):
+    """
+    spider.py 原来手写的 pyquery 版本，保持原样不要改，作为 check_parity 的标准答案。
+    DETAIL_FIELDS 新增字段时，在这里照原来的写法加上同一个字段。
+    """
+    from pyquery import PyQuery as pq
+
+    doc = pq(html)
+    # 1. 电影图片
+    img_cover = doc('img.cover').attr("src")
+    # 2. 电影名称
+    name = doc("a > h2").text()
+    # 3. 电影标签
+    categories = [item.text() for item in doc(".categories button span").items()]
+    # 4. 上映时间
+    published_at = doc(".info:contains(上映)").text()
+    # 1993-07-26 上映
+    published_at = re.search(r'(\d{4}-\d{2}-\d{2})', published_at).group(1) \
+        if published_at and re.search(r'\d{4}-\d{2}-\d{2}', published_at) else None
+    # 5. 剧情简介
+    drama = doc(".drama p").text()
+    # 6. 评分
+    score = doc("p.score").text()
+    score = float(score) if score else None
+    return {
+        "img_cover": img_cover,
+        "name": name,
+        "categories": categories,
+        "published_at": published_at,
+        "drama": drama,
+        "score": score,
+    }
+
+
+def check_parity(pages, reference, candidate):
+    """
+    用同一批网页对比两个解析后端的结果。
+    :param pages: (url, html) 的可迭代对象
+    :param reference: 作为标准的解析函数
+    :param candidate: 要对比的解析函数
+    :return: 结果不一致的 [(url, 标准结果, 对比结果)]
+    """
+    mismatches = []
+    for url, page in pages:
+        expected, actual = reference(page), candidate(page)
+        if expected != actual:
+            mismatches.append((url, expected, actual))
+    return mismatches
+
+
+def main():
+    # 在这里再导入，避免 spider.py 导入本模块时循环导入
+    from http_cache import ResponseCache
+    from spider import PARSERS
+
+    parser = argparse.ArgumentParser(description="用原来手写的 pyquery 版本检查详情页解析后端的结果")
+    parser.add_argument("--cache-dir", required=True, help="spider.py --cache-dir 保存下来的网页目录")
+    parser.add_argument("--parser", default=None, choices=sorted(PARSERS), help="只检查这个解析后端，不指定则全部检查")
+    args = parser.parse_args()
+
+    cache = ResponseCache(args.cache_dir)
+    pages = [(url, cache.load(url)) for url in cache.urls() if "/detail/" in url]
+    failed = False
+    for name in [args.parser] if args.parser else sorted(PARSERS):
+        mismatches = check_parity(pages, parse_details_reference, PARSERS[name])
+        for url, expected, actual in mismatches:
+            print(url)
+            print("  reference:", expected)
+            print(f"  {name}:", actual)
+        print(f"{name}: {len(pages) - len(mismatches)}/{len(pages)} detail pages match")
+        failed = failed or bool(mismatches)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
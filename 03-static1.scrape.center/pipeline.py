@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# @Author  : AI悦创
+# @FileName: pipeline.py
+# @Software: PyCharm
+# @Blog    ：https://bornforthis.cn/
+# threading、queue、requests、pyquery、PymongoDB
+"""
+流水线版本的爬虫：
+1. 把爬取拆成 抓取 → 解析 → 存储 三个阶段，每个阶段有自己的线程数；
+1. The crawl is split into fetch → parse → storage stages, each with its own number of threads.
+2. 阶段之间用有界队列连接，下游处理不过来时上游会自动阻塞（背压），内存占用不会无限增长；
+2. Stages are connected by bounded queues, so a slow stage blocks the one before it (back-pressure) and memory stays bounded.
+3. 网络在等待的时候 MongoDB 在写，MongoDB 在写的时候网络也在抓，三种资源同时利用起来。
+3. The network, the parser and MongoDB all work at the same time instead of taking turns.
+-------------------------------------------------
+"""
+from base_spider import Spider
+from spider import iter_detail_urls, scrape_details, parse_record, save_data_two, \
+    build_parser, configure, create_writer, is_new, download_cover, finish
+
+FETCH_WORKERS = 8
+PARSE_WORKERS = 2
+STORE_WORKERS = 2
+QUEUE_SIZE = 50  # 每个队列最多缓存的任务数
+
+
+class MovieSpider(Spider):
+    """
+    static1.scrape.center 的流水线爬虫，线程和队列由 Spider 负责，
+    这里只把每个阶段接到 spider.py 里现成的函数上。
+    """
+
+    def detail_urls(self):
+        # 索引页阶段：在当前线程里逐页解析，第一页解析完抓取线程就已经开始工作了
+        return filter(is_new, iter_detail_urls())
+
+    def fetch(self, url):
+        return scrape_details(url)
+
+    def parse_record(self, url, html):
+        return parse_record(url, html)
+
+    def create_writer(self):
+        return create_writer()
+
+    def store(self, writer, data):
+        print(data)
+        writer.add(data)
+        save_data_two(data)
+        download_cover(data)
+
+
+def run(fetch_workers=FETCH_WORKERS, parse_workers=PARSE_WORKERS, store_workers=STORE_WORKERS,
+        queue_size=QUEUE_SIZE):
+    MovieSpider(fetch_workers=fetch_workers, parse_workers=parse_workers, store_workers=store_workers,
+                queue_size=queue_size).run()
+
+
+def parse_args(args=None):
+    parser = build_parser(description="static1.scrape.center 流水线爬虫")
+    parser.add_argument("--fetch-workers", type=int, default=FETCH_WORKERS, help="抓取线程数")
+    parser.add_argument("--parse-workers", type=int, default=PARSE_WORKERS, help="解析线程数")
+    parser.add_argument("--store-workers", type=int, default=STORE_WORKERS, help="存储线程数")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="阶段之间队列的容量")
+    args = parser.parse_args(args)
+    args.pool_size = args.pool_size or args.fetch_workers
+    return args
+
+
+def main():
+    args = parse_args()
+    configure(args)
+    run(fetch_workers=args.fetch_workers, parse_workers=args.parse_workers,
+        store_workers=args.store_workers, queue_size=args.queue_size)
+    finish()
+
+
+if __name__ == '__main__':
+    main()
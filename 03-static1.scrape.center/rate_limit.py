@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+# @Author  : AI悦创
+# @FileName: rate_limit.py
+# @Software: PyCharm
+# @Blog    ：https://bornforthis.cn/
+"""
+请求节奏控制：
+1. HostRateLimiter：每个域名一个令牌桶，限制每秒请求数，允许短时间的突发；
+1. HostRateLimiter: one token bucket per host caps requests per second while allowing short bursts.
+2. AIMDController：延迟和错误率稳定时逐步加大并发（加法增），遇到 429/5xx 立刻减半（乘法减）；
+2. AIMDController: concurrency grows additively while latency and errors stay flat and halves on 429/5xx.
+3. 同时支持线程（spider.py / pipeline.py）和协程（async_spider.py）。
+3. Works for both threads (spider.py / pipeline.py) and coroutines (async_spider.py).
+-------------------------------------------------
+"""
+import asyncio
+import threading
+import time
+from urllib.parse import urlsplit
+
+BACKOFF_STATUS = {429, 500, 502, 503, 504}  # 说明对方扛不住了，需要降速
+
+
+class TokenBucket(object):
+    def __init__(self, rate, burst=1):
+        """
+        :param rate: 每秒生成的令牌数，也就是平均每秒请求数
+        :param burst: 桶的容量，允许的最大突发请求数
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """
+        预订一个令牌。
+        :return: 需要等待的秒数，0 表示可以立刻发请求
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            # 令牌不够时先欠着，等待时间就是把欠的令牌补回来所需的时间
+            return max(0.0, -self.tokens / self.rate)
+
+
+class HostRateLimiter(object):
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, url):
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate, self.burst)
+            return self.buckets[host]
+
+    def wait(self, url):
+        delay = self.bucket(url).reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def wait_async(self, url):
+        delay = self.bucket(url).reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class AIMDController(object):
+    def __init__(self, initial=2, minimum=1, maximum=32, window=20, tolerance=1.5, cooldown=1.0):
+        """
+        :param initial: 初始并发数
+        :param minimum: 并发数下限
+        :param maximum: 并发数上限
+        :param window: 每统计多少个请求决定一次是否加大并发
+        :param tolerance: 窗口平均延迟超过历史最好水平的多少倍时，认为对方开始变慢，不再加大并发
+        :param cooldown: 两次减半之间至少间隔的秒数，同一波错误只减半一次
+        """
+        self.limit = max(minimum, min(initial, maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.window = window
+        self.tolerance = tolerance
+        self.latencies = []
+        self.cooldown = cooldown
+        self.best_latency = None
+        self.last_decrease = 0.0
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    def record(self, latency, status):
+        """
+        记录一次请求的结果。
+        :param latency: 耗时（秒）
+        :param status: HTTP 状态码，请求异常时为 None
+        """
+        with self.condition:
+            if status is None or status in BACKOFF_STATUS:
+                now = time.monotonic()
+                if now - self.last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit // 2)
+                    self.last_decrease = now
+                self.latencies = []
+                return
+            self.latencies.append(latency)
+            if len(self.latencies) < self.window:
+                return
+            average = sum(self.latencies) / len(self.latencies)
+            self.latencies = []
+            if self.best_latency is None or average < self.best_latency:
+                self.best_latency = average
+            if average <= self.best_latency * self.tolerance:
+                self.limit = min(self.maximum, self.limit + 1)
+                self.condition.notify_all()
+
+    def acquire(self):
+        with self.condition:
+            self.condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+class AsyncLimiter(object):
+    """
+    协程版本的并发闸门，用法和 asyncio.Semaphore 一样：async with limiter: ...
+    同时在途的请求数由 AIMDController.limit 决定。
+    """
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.in_flight = 0
+        self.condition = None
+
+    async def __aenter__(self):
+        if self.condition is None:
+            self.condition = asyncio.Condition()
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < self.controller.limit)
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# @Author  : AI悦创
+# @FileName: retry.py
+# @Software: PyCharm
+# @Blog    ：https://bornforthis.cn/
+"""
+请求失败后的重试策略：
+1. 只重试网络异常和 RETRY_STATUS 里的状态码，404 这种重试也没用的直接放弃；
+1. Only network errors and the status codes in RETRY_STATUS are retried; hopeless ones such as 404 are not.
+2. 等待时间指数增长并加上随机抖动，避免所有请求在同一时刻一起重试；
+2. Waits grow exponentially with random jitter so retries do not all fire at the same moment.
+3. 服务器返回了 Retry-After 就按它说的时间等待。
+3. A Retry-After header from the server takes precedence.
+-------------------------------------------------
+"""
+import datetime
+import random
+from email.utils import parsedate_to_datetime
+
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def parse_retry_after(value):
+    """
+    Retry-After 可能是秒数，也可能是 HTTP 日期。
+    :return: 需要等待的秒数，无法解析时返回 None
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, (when - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+class RetryPolicy(object):
+    def __init__(self, retries=2, backoff=0.5, max_backoff=30.0, retry_status=RETRY_STATUS):
+        """
+        :param retries: 第一次失败后最多再重试几次，0 表示不重试
+        :param backoff: 第一次重试前等待的基准秒数，之后每次翻倍
+        :param max_backoff: 单次等待的上限
+        :param retry_status: 需要重试的状态码
+        """
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_status = retry_status
+
+    def should_retry(self, attempt, status):
+        """
+        :param attempt: 已经失败的次数减一，第一次请求为 0
+        :param status: HTTP 状态码，请求异常时为 None
+        """
+        return attempt < self.retries and (status is None or status in self.retry_status)
+
+    def delay(self, attempt, retry_after=None):
+        """
+        :return: 第 attempt 次失败后需要等待的秒数
+        """
+        seconds = parse_retry_after(retry_after)
+        if seconds is not None:
+            return min(seconds, self.max_backoff)
+        # full jitter：在 0 到指数退避时间之间随机取值
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
@@ -22,18 +22,36 @@
 - 遍历页码构造 10页索引 URL
 - 从每个索引页分析提取出每个电影的详情页 URL
 """
+import argparse  # 命令行参数
+import datetime  # 记录爬取时间
 import requests  # 爬取页面
 import logging  # logging 用来输出信息
 import re  # re 用来实现正则表达式解析
-import pymongo  # 用来数据存储
+import time
+import os
+import tempfile
 from pyquery import PyQuery as pq  # 用来直接解析网页
 from urllib.parse import urljoin  # 用来 URL 的拼接
-from inster_data_function import write_mongodb
+from multiprocessing import Pool  # 多进程加速
+from inster_data_function import write_mongodb, BulkWriter, MONGO_URI, get_client
+from http_cache import ResponseCache
+from decoding import ACCEPT_ENCODING, FALLBACKS, declared_encoding, decode
+from streaming import IndexStream, stream_details
+from parsers import FIELD_NAMES, parse_details_lxml, parse_total_page, select_fields
+from fetcher import create_session
+from rate_limit import HostRateLimiter, AIMDController
+from retry import RetryPolicy
+from frontier import Frontier
+from work_queue import WorkQueue
+from dedup import SharedSeenSet, canonicalize_url, make_seen_set
+from images import CoverDownloader
+from metrics import METRICS
 
 # --------
 # from bs4 import BeautifulSoup
 
-CLIENT = pymongo.MongoClient(host="localhost", port=27017)
+DB_PREFIX = ""  # 数据库名前缀，基准测试用 bench_，不碰真实的 Movies / Movie_two
+CLIENT = get_client(MONGO_URI)
 db = CLIENT["Movies"]
 collection = db["Movies"]
 
@@ -42,33 +60,256 @@ logging.basicConfig(level=logging.INFO,
                     format="%(asctime)s - %(levelname)s: %(message)s")
 
 BASE_URL = "https://static1.scrape.center"
-TOTAL_PAGE = 10
+TOTAL_PAGE = 10  # 分页器里读不到总页数时才使用
+POOL_SIZE = 10  # 每个进程里 Session 的连接池大小
+BATCH_SIZE = 100  # 批量写入 MongoDB 的条数
+FRONTIER_PATH = "frontier.db"  # --resume 时默认的爬取进度文件
+QUEUE_POLL = 1.0  # 分布式模式下队列暂时为空时，等多久再去租
+
+SESSION = None  # 当前进程共用的 requests.Session
+CACHE = None  # 磁盘响应缓存，None 表示不缓存
+OFFLINE = False  # True 时只读缓存，不发请求
+RAW_BYTES = False  # True 时 UTF-8 的详情页不解码，bytes 直接交给 lxml 解析
+STREAM = False  # True 时边下载边解析，不把整页内容攒在内存里
+CHUNK_SIZE = 16 * 1024  # 边下载边解析时每次读取的字节数
+RATE_LIMITER = None  # 每个域名的令牌桶限速，None 表示不限速
+CONTROLLER = None  # AIMD 自适应并发控制，None 表示并发数由线程数决定
+RETRY = RetryPolicy()  # 失败重试策略
+FRONTIER = None  # 持久化的爬取进度，None 表示不记录
+QUEUE = None  # 多台机器共用的 MongoDB 爬取队列，None 表示只在本机爬取
+SEEN = make_seen_set()  # 已经见过的详情页 URL
+DOWNLOADER = None  # 封面下载器，None 表示不下载封面
+HASHES = None  # 已入库电影的内容哈希 {name: content_hash}，None 表示不做变化检测
+TOUCH_FIELDS = ()  # 内容没变时仍然要更新的字段
+KNOWN_URLS = set()  # 增量爬取时已经入库、且还没过期的详情页 URL
+
+
+def get_session():
+    global SESSION
+    if SESSION is None:
+        SESSION = create_session(POOL_SIZE)
+    return SESSION
+
+
+def set_session(pool_size=POOL_SIZE):
+    """
+    按并发数重新创建当前进程的 Session。
+    """
+    global SESSION
+    SESSION = create_session(pool_size)
+    return SESSION
+
+
+def set_raw_bytes(enabled=False):
+    """
+    :param enabled: 详情页直接返回 bytes，只有 lxml 解析后端支持
+    """
+    global RAW_BYTES
+    RAW_BYTES = enabled and PARSER == "lxml"
+    if enabled and not RAW_BYTES:
+        logging.warning("--raw-bytes only works with --parser lxml, decoding pages as usual")
+    return RAW_BYTES
+
+
+def set_cache(directory=None, offline=False):
+    """
+    打开磁盘响应缓存。
+    :param directory: 缓存目录，None 表示不缓存
+    :param offline: 只用缓存里的内容，不发任何请求
+    """
+    global CACHE, OFFLINE
+    CACHE = ResponseCache(directory) if directory else None
+    OFFLINE = offline and CACHE is not None
+    return CACHE
+
+
+def set_rate_limit(rate=None, burst=1, adaptive=False, max_concurrency=POOL_SIZE):
+    """
+    :param rate: 每个域名每秒最多请求数，None 表示不限速
+    :param burst: 允许的突发请求数
+    :param adaptive: 是否开启 AIMD 自适应并发，开启后 max_concurrency 只是上限
+    """
+    global RATE_LIMITER, CONTROLLER
+    RATE_LIMITER = HostRateLimiter(rate, burst) if rate else None
+    CONTROLLER = AIMDController(maximum=max_concurrency) if adaptive else None
+
+
+def request(url, headers=None, stream=False):
+    """
+    发出一次 GET 请求：先按域名限速，再占一个并发名额，结束后把耗时和状态码报告给并发控制器。
+    :param stream: 只等到响应头就返回，网页内容由调用方边读边处理
+    """
+    if RATE_LIMITER:
+        RATE_LIMITER.wait(url)
+    if CONTROLLER is None:
+        return get_session().get(url, headers=headers, stream=stream)
+    with CONTROLLER:
+        start, status = time.monotonic(), None
+        try:
+            response = get_session().get(url, headers=headers, stream=stream)
+            status = response.status_code
+            return response
+        finally:
+            CONTROLLER.record(time.monotonic() - start, status)
+
+
+def set_retry(retries=2, backoff=0.5):
+    global RETRY
+    RETRY = RetryPolicy(retries=retries, backoff=backoff)
+    return RETRY
 
 
 # 1
-def scrape_page(url):
+def scrape_page(url, raw=False, headers=None, attempt=0):
     """
     考虑到，我们不仅仅要抓取主页面，还需要抓取详情页的数据，所以这个地方，我编写了一个比较通用的爬取页面的方法。
     :param url:
-    :return: response.text >>> HTML
+    :param raw: 网页是 UTF-8 编码时直接返回 bytes，不解码
+    :param headers: 只加在这次请求上的请求头，不会改动共用的 Session
+    :param attempt: 之前已经失败过几次，重试次数从这里接着算
+    :return: HTML
+    """
+    # 字节数按下载到的 bytes 统计，不是解码后的字符数，中文网页两者差很多
+    start, size, error = time.monotonic(), 0, True
+    try:
+        html, size = download(url, raw, headers, attempt)
+        error = False
+        return html
+    finally:
+        METRICS.record("scrape_page", time.monotonic() - start, size, error)
+
+
+def download(url, raw=False, headers=None, attempt=0):
+    """
+    :return: (HTML, 下载的字节数)，读缓存、304 时字节数为 0
     """
     # logging.info("scraping %s...", url)
+    if OFFLINE:
+        html = CACHE.load(url)
+        if html is None:
+            logging.error("%s is not in the cache", url)
+        return html, 0
+    # 有缓存时带上 ETag / Last-Modified，内容没变服务器只返回 304
+    headers = dict(headers or {})
+    if CACHE:
+        headers.update(CACHE.conditional_headers(url))
+    for attempt in range(attempt, RETRY.retries + 1):
+        status, retry_after = None, None
+        try:
+            response = request(url, headers=headers)
+            status = response.status_code
+            if status == 304 and CACHE:
+                return CACHE.load(url), 0
+            if status == 200:
+                # 不用 response.text：没有声明编码时它会用 chardet 猜，很慢
+                content = response.content
+                encoding = declared_encoding(content, response.headers.get("Content-Type"))
+                if raw and encoding == "utf-8":
+                    html = content
+                else:
+                    html, encoding = decode(content, response.headers.get("Content-Type"))
+                response.encoding = encoding  # 缓存按这个编码读回来
+                if CACHE:
+                    CACHE.store(url, response)
+                return html, len(content)
+            retry_after = response.headers.get("Retry-After")
+            logging.error("get invalid status code %s while scraping %s", status, url)
+        except requests.RequestException:
+            logging.error("error occurred while scraping %s", url, exc_info=True)
+        if not RETRY.should_retry(attempt, status):
+            return None, 0
+        # 只有当前这个线程在等，其它线程的请求照常进行
+        delay = RETRY.delay(attempt, retry_after)
+        logging.warning("retry %s in %.1fs (%s/%s)", url, delay, attempt + 1, RETRY.retries)
+        time.sleep(delay)
+
+
+def set_stream(enabled=False):
+    """
+    :param enabled: 边下载边解析；用了缓存时网页已经在磁盘上，不需要
+    """
+    global STREAM
+    STREAM = enabled and CACHE is None
+    if enabled and not STREAM:
+        logging.warning("--stream is ignored together with --cache-dir")
+    return STREAM
+
+
+def open_stream(url):
+    """
+    发出流式请求，收到响应头就返回。
+    请求出错或者状态码值得重试（比如 503）时，按重试策略退回 scrape_page；404 这种直接放弃，不会再请求一次。
+    流式请求算作第一次尝试，退回 scrape_page 后只用剩下的重试次数，总请求数和不用 --stream 时一样。
+    :return: (网页内容的 bytes 块生成器, 编码)，失败时返回 None
+    """
+    status, retry_after = None, None
     try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            return response.text
-        logging.error("get invalid status code %s while scraping %s", response.status_code, url)
+        response = request(url, stream=True)
+        status = response.status_code
+        if status == 200:
+            # 先读第一块看 <meta charset>；都没有声明时不能交给 lxml 猜，它会按 Latin-1 解码
+            chunks = iter_chunks(response)
+            first = next(chunks, b"")
+            encoding = declared_encoding(first, response.headers.get("Content-Type")) or FALLBACKS[0]
+            return prepend(first, chunks), encoding
+        retry_after = response.headers.get("Retry-After")
+        response.close()
+        logging.error("get invalid status code %s while scraping %s", status, url)
     except requests.RequestException:
         logging.error("error occurred while scraping %s", url, exc_info=True)
+    if not RETRY.should_retry(0, status):
+        return None
+    time.sleep(RETRY.delay(0, retry_after))
+    html = scrape_page(url, attempt=1)
+    return (iter_html(html), "utf-8") if html else None
+
+
+def prepend(first, chunks):
+    try:
+        yield first
+        yield from chunks
+    finally:
+        chunks.close()
+
+
+def iter_html(html):
+    # 退回 scrape_page 时整页作为一块，和流式响应一样是可以 close() 的生成器
+    yield html.encode("utf-8")
+
+
+def iter_chunks(response):
+    # 统计的是从第一块到最后一块的时间，包括边下载边解析花的时间
+    start, size = time.monotonic(), 0
+    try:
+        for chunk in response.iter_content(CHUNK_SIZE):
+            size += len(chunk)
+            yield chunk
+    finally:
+        response.close()
+        METRICS.record("stream_page", time.monotonic() - start, size)
+
+
+def set_base_url(base_url=None):
+    """
+    换一个站点地址，比如基准测试时指向本地的录制服务器。
+    """
+    global BASE_URL
+    BASE_URL = (base_url or BASE_URL).rstrip("/")
+    return BASE_URL
 
 
 # 2
+def get_index_url(page):
+    return f"{BASE_URL}/page/{page}"  # 构造链接
+
+
 def scrape_index(page):
-    index_url = f"{BASE_URL}/page/{page}"  # 构造链接
+    index_url = get_index_url(page)
     return scrape_page(index_url)  # 直接取抓取
 
 
 # 3
+@METRICS.timed("parse_index")
 def parse_index(html):
     doc = pq(html)
     links = doc(".el-card .name")
@@ -81,63 +322,280 @@ def parse_index(html):
         yield detail_url
 
 
+def stream_index(index_url):
+    """
+    --stream 时代替 scrape_page + parse_index：每张电影卡片一闭合就交出它的详情页 URL。
+    :return: streaming.IndexStream，请求失败时返回 None
+    """
+    stream = open_stream(index_url)
+    if stream is None:
+        return None
+    chunks, encoding = stream
+    return IndexStream(chunks, index_url, encoding)
+
+
+def index_links(index_url):
+    """
+    :return: 索引页上详情页 URL 的可迭代对象，请求失败时返回 None
+    """
+    if STREAM:
+        return stream_index(index_url)
+    index_html = scrape_page(index_url)
+    return parse_index(index_html) if index_html else None
+
+
+def is_complete(links):
+    """
+    边下载边解析时，遍历完 IndexStream 才知道这一页是不是完整下载了。
+    """
+    return not isinstance(links, IndexStream) or links.complete
+
+
+def iter_detail_urls():
+    """
+    逐页解析索引页，解析出一个详情页 URL 就马上交出去，不用等所有索引页都爬完。
+    总页数从第一页的分页器里读；读不到就一直往后翻，直到遇到没有电影的空页。
+    续爬时先交出上次没完成的详情页，已经完成的索引页直接跳过。
+    """
+    if FRONTIER:
+        yield from FRONTIER.pending()
+    page, total_page = 1, None
+    if FRONTIER and FRONTIER.get("total_page"):
+        total_page = int(FRONTIER.get("total_page"))
+    while total_page is None or page <= total_page:
+        if FRONTIER and FRONTIER.is_done(get_index_url(page)):
+            page += 1
+            continue
+        if STREAM:
+            # 边下载边解析：分页器在网页后面，要等这一页的 URL 都交出去以后才能读
+            index = stream_index(get_index_url(page))
+            links = index or []
+        else:
+            index_html = scrape_index(page)
+            links = list(parse_index(index_html)) if index_html else []
+        for url in track(unique(links)):
+            yield url
+        # 空页按这一页原本有多少链接判断：链接全都见过（重复出现、上次已经记录）的页不是空页
+        if STREAM:
+            complete, count = index is not None and index.complete, index.links if index else 0
+        else:
+            complete, count = bool(index_html), len(links)
+        if not complete:
+            # 不知道总页数时，爬不下来就只能停在这里
+            if total_page is None:
+                return
+            page += 1
+            continue
+        if page == 1:
+            # 边下载边解析时分页器已经在遍历中读好了
+            total_page = index.total_page if STREAM else parse_total_page(index_html)
+            logging.info("total page %s", total_page or "unknown")
+            if FRONTIER and total_page:
+                FRONTIER.set("total_page", total_page)
+        if FRONTIER:
+            FRONTIER.done(get_index_url(page), kind="index")
+        if not count and total_page is None:
+            return
+        page += 1
+
+
+def discover_total_page():
+    """
+    :return: (总页数, 第一页的 HTML)，HTML 留给调用方直接解析，不用再请求一次；
+             总页数来自上次的爬取进度时不发请求，HTML 为 None
+    """
+    if FRONTIER and FRONTIER.get("total_page"):
+        return int(FRONTIER.get("total_page")), None
+    index_html = scrape_index(1)
+    return (parse_total_page(index_html) if index_html else None) or TOTAL_PAGE, index_html
+
+
+def set_frontier(path=None, resume=False, prepare=True):
+    """
+    :param path: 爬取进度文件，None 表示不记录进度
+    :param resume: 接着上次的进度爬；否则清空上次的记录
+    :param prepare: 只在主进程里清空或恢复进度，子进程直接打开同一个文件
+    """
+    global FRONTIER
+    FRONTIER = Frontier(path) if path else None
+    if FRONTIER and prepare:
+        if resume:
+            FRONTIER.requeue()
+            logging.info("resume crawl: %s", FRONTIER.counts())
+        else:
+            FRONTIER.reset()
+    return FRONTIER
+
+
+def set_dedup(kind="exact", capacity=1000000, path=None):
+    """
+    :param kind: exact 精确去重；bloom 用布隆过滤器，内存固定，适合上百万 URL
+    :param capacity: 布隆过滤器预计的 URL 数量
+    :param path: 多进程模式下所有进程共用的 SQLite 去重文件，指定后忽略 kind
+    """
+    global SEEN
+    SEEN = SharedSeenSet(path) if path else make_seen_set(kind, capacity)
+    return SEEN
+
+
+def unique(detail_urls):
+    """
+    去重，同一个详情页出现在多个索引页里也只爬一次。
+    规范化后的 URL 只用来判断是否重复，交出去请求的还是原来的 URL：
+    去掉结尾的斜杠、重新编码查询参数以后，服务器不一定认为是同一个网页。
+    """
+    for url in detail_urls:
+        if SEEN.add(canonicalize_url(url)):
+            yield url
+
+
+def track(detail_urls):
+    """
+    把详情页 URL 记进 frontier，只放行第一次见到的；记录过但没完成的由 FRONTIER.pending() 负责续爬。
+    """
+    for url in detail_urls:
+        if FRONTIER is None or FRONTIER.add(url):
+            yield url
+
+
+def mark_done(records):
+    """
+    BulkWriter 写入成功后回调，这时详情页才算真正完成。
+    """
+    for data in records:
+        if FRONTIER:
+            FRONTIER.done(data["url"])
+        if QUEUE:
+            QUEUE.done(data["url"])
+
+
+def mark_failed(records):
+    """
+    BulkWriter 写入失败后回调：把 URL 放回共享队列，不用等租约过期就能被重新爬取。
+    """
+    if QUEUE:
+        for data in records:
+            QUEUE.release(data["url"])
+
+
 # 4 请求详情页
 def scrape_details(url):
-    return scrape_page(url)
+    if FRONTIER:
+        FRONTIER.start(url)
+    return scrape_page(url, raw=RAW_BYTES)
 
 
+def parse_details_pyquery(html, fields=None):
+    """
+    选择器、取值方式和后处理都来自 parsers.DETAIL_FIELDS，和 lxml 后端共用一份声明，
+    在 DETAIL_FIELDS 里新增一个字段，两个后端都会提取。
+    :param fields: 只提取这些字段，None 表示全部；没用到的选择器不会执行
+    """
+    # parser="html"：按 HTML 解析，元素才有 parsers.text 用到的 text_content()
+    doc = pq(html, parser="html")
+    # doc(选择器) 得到的就是 lxml 元素列表，交给字段自己的取值方式和后处理
+    return {field.name: field.value(list(doc(field.selector))) for field in select_fields(fields)}
+
+
+# 详情页解析后端，通过 --parser 选择，两者返回的字典完全一致
+PARSERS = {
+    "pyquery": parse_details_pyquery,
+    "lxml": parse_details_lxml,
+}
+PARSER = "pyquery"
+FIELDS = None  # 只提取、只存储这些字段，None 表示全部
+
+
+def set_parser(name="pyquery"):
+    global PARSER
+    if name not in PARSERS:
+        raise ValueError(f"unknown parser {name!r}, choose from {sorted(PARSERS)}")
+    PARSER = name
+
+
+def set_fields(names=None):
+    """
+    字段投影：比如只跟踪评分时用 ["score"]，剧情简介这类长字段既不解析也不写入。
+    :param names: 字段名列表，None 表示全部
+    """
+    global FIELDS
+    if names is None:
+        FIELDS = None
+        return FIELDS
+    select_fields(names)  # 检查字段名
+    # name 是 upsert 的 key，必须带上，只写入的字段才不会覆盖数据库里的其它字段
+    FIELDS = tuple(name for name in FIELD_NAMES if name in names or name == "name")
+    return FIELDS
+
+
+@METRICS.timed("parse_details")
 def parse_details(html):
-    # soup = BeautifulSoup(html, "lxml")
-    # img_link = soup.select(".el-col .cover")
-    #
-    # print(img_link)
-    doc = pq(html)
-    # 1. 电影图片
-    img_cover = doc('img.cover').attr("src")
-    # 2. 电影名称
-    # name = doc("a h2")
-    name = doc("a > h2").text()
-    # 3. 电影标签
-    categories = [item.text() for item in doc(".categories button span").items()]
-    # 4. 上映时间
-    # published_at = [item.text() for item in doc(".info span").items()]
-    # published_at = "".join(published_at)
-    published_at = doc(".info:contains(上映)").text()
-    # 1993-07-26 上映
-    # re
-    published_at = re.search('(\d{4}-\d{2}-\d{2})', published_at).group(1) \
-        if published_at and re.search('\d{4}-\d{2}-\d{2}', published_at) else None
-    # 与上面的代码等价
-    # if published_at and re.search('\d{4}-\d{2}-\d{2}', published_at):
-    #     published_at = re.search('(\d{4}-\d{2}-\d{2})', published_at).group(1)
-    # else:
-    #     published_at = None
-    # 5. 剧情简介
-    drama = doc(".drama p").text()
-    # 6. 评分
-    score = doc("p.score").text()
-    # 转换数据类型
-    # if score:
-    #     score = float(score)
-    # else:
-    #     score = None
-    score = float(score) if score else None
-    # print(img_cover)
-    # print(name)
-    # print(categories, type(categories))
-    # print(published_at)
-    # print(drama)
-    # print(score)
-    return {
-        "img_cover": img_cover,
-        "name": name,
-        "categories": categories,
-        "published_at": published_at,
-        "drama": drama,
-        "score": score,
-    }
+    return PARSERS[PARSER](html, FIELDS)
+
+
+def parse_record(url, html):
+    """
+    解析详情页，并记下来源 URL 和爬取时间，增量爬取靠这两个字段判断要不要重新抓取。
+    """
+    return annotate(url, parse_details(html))
+
+
+def scrape_record(url):
+    """
+    抓取并解析一个详情页，--stream 时边下载边提取字段。
+    :return: 字典，抓取失败时返回 None
+    """
+    if not STREAM:
+        html = scrape_details(url)
+        return parse_record(url, html) if html else None
+    if FRONTIER:
+        FRONTIER.start(url)
+    stream = open_stream(url)
+    if stream is None:
+        return None
+    chunks, encoding = stream
+    try:
+        data = stream_details(chunks, select_fields(FIELDS), encoding)
+    except OSError:
+        logging.error("error occurred while streaming %s", url, exc_info=True)
+        return None
+    finally:
+        # 需要的字段都拿到后就不再往下读，剩下的内容连同连接一起丢掉
+        chunks.close()
+    return annotate(url, data)
+
+
+def annotate(url, data):
+    data["url"] = url
+    data["crawled_at"] = datetime.datetime.utcnow()
+    return data
 
 
+def load_known_urls(ttl=None):
+    """
+    从 Movies 表里读出已经爬过的详情页 URL。
+    :param ttl: 有效期（秒），超过有效期的记录需要重新爬取；None 表示一直有效
+    :return: set(url)
+    """
+    query = {"url": {"$exists": True}}
+    if ttl is not None:
+        query["crawled_at"] = {"$gte": datetime.datetime.utcnow() - datetime.timedelta(seconds=ttl)}
+    return {item["url"] for item in collection.find(query, {"url": 1, "_id": 0})}
+
+
+def set_incremental(enabled=False, ttl=None):
+    global KNOWN_URLS
+    KNOWN_URLS = load_known_urls(ttl) if enabled else set()
+    if enabled:
+        logging.info("incremental crawl: %s detail pages are up to date", len(KNOWN_URLS))
+    return KNOWN_URLS
+
+
+def is_new(url):
+    return url not in KNOWN_URLS
+
+
+@METRICS.timed("save_data")
 def save_data(data):
     collection.update_one({
         'name': data.get('name'),
@@ -145,26 +603,345 @@ def save_data(data):
         '$set': data
     }, upsert=True)
 
+def load_hashes():
+    """
+    :return: {name: content_hash}，数据库里每部电影上次写入时的内容哈希
+    """
+    query = {"content_hash": {"$exists": True}}
+    return {item["name"]: item["content_hash"] for item in collection.find(query, {"name": 1, "content_hash": 1, "_id": 0})}
+
+
+def set_skip_unchanged(enabled=False, touch=()):
+    """
+    :param enabled: 内容哈希和数据库里一样的电影不再写入
+    :param touch: 内容没变时仍然要更新的字段，比如增量爬取的有效期需要刷新 crawled_at
+    """
+    global HASHES, TOUCH_FIELDS
+    HASHES = load_hashes() if enabled else None
+    TOUCH_FIELDS = tuple(touch)
+    return HASHES
+
+
+def create_writer(batch_size=BATCH_SIZE):
+    """
+    save_data 的批量版本，用法：writer.add(data)，结束时 writer.close() 把剩下的写进去。
+    """
+    return BulkWriter(collection, key="name", batch_size=batch_size, on_flush=mark_done if FRONTIER or QUEUE else None,
+                      on_error=mark_failed if QUEUE else None, hashes=HASHES, volatile=("crawled_at",), touch=TOUCH_FIELDS, metrics=METRICS)
+
+
+def set_images(directory=None, workers=8):
+    """
+    :param directory: 封面保存目录，None 表示不下载封面
+    :param workers: 下载线程数
+    """
+    global DOWNLOADER
+    DOWNLOADER = CoverDownloader(directory, create_session(workers), workers) if directory else None
+    return DOWNLOADER
+
+
+def download_cover(data):
+    """
+    把封面交给后台线程下载，不会拖慢详情页的爬取。
+    """
+    if DOWNLOADER:
+        DOWNLOADER.submit(data.get("img_cover"))
+
+
+@METRICS.timed("save_data_two")
 def save_data_two(data):
     write_mongodb(
-        db_name="Movie_two",
+        db_name=DB_PREFIX + "Movie_two",
         table_name="Movie_two",
-        insert_data=data
+        insert_data=dict(data),  # insert_one 会往字典里加 _id，不能改到调用方的 data
+        uri=MONGO_URI
     )
 
-def main():
-    for page in range(1, TOTAL_PAGE + 1):
-        index_html = scrape_index(page)
-        detail_urls = parse_index(index_html)
-        # logging.info("detail urls %s", list(detail_urls)
-        for url in detail_urls:
-            html = scrape_details(url)
-            data = parse_details(html)
+def crawl_details(detail_urls):
+    """
+    逐个爬取、解析、保存详情页，数据攒够一批再用一次 bulk_write 写入。
+    :param detail_urls: 详情页 URL 的可迭代对象，可以是边解析边产出的生成器
+    """
+    with create_writer() as writer:
+        for url in filter(is_new, detail_urls):
+            data = scrape_record(url)
+            if data is None:
+                continue
+            print(data)
+            writer.add(data)
+            save_data_two(data)
+            download_cover(data)
+
+
+def crawl_page(page, index_html=None):
+    """
+    爬取一页索引页以及它下面的所有详情页，多进程模式下每个任务就是一页。
+    :param page: 页码
+    :param index_html: 已经爬下来的索引页（比如读总页数时的第一页），None 表示需要请求
+    """
+    index_url = get_index_url(page)
+    if FRONTIER and FRONTIER.is_done(index_url):
+        return METRICS.drain()
+    links = parse_index(index_html) if index_html else index_links(index_url)
+    if links is None:
+        return METRICS.drain()
+    # logging.info("detail urls %s", list(detail_urls)
+    crawl_details(track(unique(links)))
+    if FRONTIER and is_complete(links):
+        FRONTIER.done(index_url, kind="index")
+    if DOWNLOADER:
+        # 子进程没有退出时的回调，每页结束时就等封面下载完
+        DOWNLOADER.join()
+    # 子进程的统计交给主进程合并
+    return METRICS.drain()
+
+
+def set_queue(name=None, lease=60, reset=False, prepare=True):
+    """
+    :param name: Movies 库里作为共享队列的表名，None 表示不用分布式模式
+    :param lease: 租约时长（秒）
+    :param reset: 清空队列重新爬；否则接着队列里的进度爬
+    :param prepare: 只在主进程里清空队列
+    """
+    global QUEUE
+    QUEUE = WorkQueue(db[name], lease) if name else None
+    if QUEUE and prepare:
+        if reset:
+            QUEUE.reset()
+        logging.info("work queue %s: %s", name, QUEUE.counts())
+    return QUEUE
+
+
+def seed_queue():
+    """
+    把所有索引页放进共享队列。每台机器启动时都会调用，但只有队列里还没有索引页时才需要请求第一页读总页数；
+    读总页数时爬下来的第一页直接解析，详情页放进队列后第一页标记完成，不会再被租走重新请求。
+    """
+    if QUEUE.has_kind("index"):
+        logging.info("index pages already seeded")
+        return
+    total_page, first_html = discover_total_page()
+    pages = range(1, total_page + 1)
+    added = QUEUE.add_many([get_index_url(page) for page in pages], kind="index")
+    logging.info("seeded %s new index pages", added)
+    if first_html:
+        QUEUE.add_many(filter(is_new, unique(parse_index(first_html))))
+        QUEUE.done(get_index_url(1))
+
+
+def crawl_queue(worker=0):
+    """
+    分布式模式：不停地从共享队列里租 URL 来爬，索引页解析出的详情页放回队列，由所有机器一起爬。
+    队列里没有任务、其它进程手上也没有会产生新任务的 URL 时退出。
+    :param worker: 进程编号，只是为了能用 Pool.map 分发
+    :return: 当前进程的统计，交给主进程合并
+    """
+    with create_writer() as writer:
+        while True:
+            leased = QUEUE.lease_next()
+            if leased is None:
+                # 自己攒着没写入的数据先写进去，它们的 URL 才会标记完成
+                writer.flush()
+                if not QUEUE.active():
+                    break
+                time.sleep(QUEUE_POLL)
+                continue
+            url, kind = leased
+            if kind == "index":
+                links = index_links(url)
+                if links is None:
+                    QUEUE.release(url)
+                    continue
+                QUEUE.add_many(filter(is_new, unique(links)))
+                if is_complete(links):
+                    QUEUE.done(url)
+                else:
+                    QUEUE.release(url)
+                continue
+            data = scrape_record(url)
+            if data is None:
+                QUEUE.release(url)
+                continue
             print(data)
-            save_data(data)
+            writer.add(data)
             save_data_two(data)
+            download_cover(data)
+    if DOWNLOADER:
+        DOWNLOADER.join()
+    return METRICS.drain()
+
+
+def set_mongo(uri=MONGO_URI, prefix=""):
+    """
+    连接到指定的 MongoDB，分布式模式下所有机器要连同一个。
+    :param prefix: 数据库名前缀，比如 bench_ 表示写进 bench_Movies、bench_Movie_two
+    """
+    global MONGO_URI, DB_PREFIX, CLIENT, db, collection
+    MONGO_URI, DB_PREFIX = uri, prefix
+    CLIENT = get_client(uri)
+    db = CLIENT[prefix + "Movies"]
+    collection = db["Movies"]
+    return CLIENT
+
+
+def init_worker(args):
+    """
+    子进程初始化：MongoClient 和 Session 都不能跨 fork 使用，每个进程重新建立自己的连接。
+    """
+    configure(args, prepare=False)
+
+
+def build_parser(description="static1.scrape.center 电影爬虫"):
+    """
+    spider.py、pipeline.py 共用的命令行参数。
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--base-url", default=BASE_URL,
+                        help="站点地址，基准测试时可以指向 bench_server.py 启动的本地服务器")
+    parser.add_argument("--pool-size", type=int, default=None,
+                        help="每个进程的 HTTP 连接池大小，默认与并发数相同")
+    parser.add_argument("--cache-dir", default=None,
+                        help="HTTP 响应缓存目录，不指定则不缓存")
+    parser.add_argument("--offline", action="store_true",
+                        help="只从缓存目录读取网页，不发请求")
+    parser.add_argument("--parser", default="pyquery", choices=["pyquery", "lxml"],
+                        help="详情页解析后端")
+    parser.add_argument("--fields", type=lambda value: value.split(","), default=None,
+                        help=f"只提取、只存储这些字段，逗号分隔，可选 {','.join(FIELD_NAMES)}；不指定则全部")
+    parser.add_argument("--stream", action="store_true",
+                        help="边下载边解析：索引页每张卡片一闭合就交出 URL，详情页用 lxml 边读边提取字段")
+    parser.add_argument("--raw-bytes", action="store_true",
+                        help="UTF-8 的详情页不解码，bytes 直接交给 lxml 解析，需要 --parser lxml")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="每个域名每秒最多请求数，--workers 时平分给每个进程；"
+                             "--queue 多台机器时是每台机器的上限。不指定则不限速")
+    parser.add_argument("--burst", type=int, default=1,
+                        help="限速时允许的突发请求数")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="AIMD 自适应并发：延迟平稳时逐步加并发，遇到 429/5xx 减半；"
+                             "只对多线程抓取（pipeline.py）有效")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="请求失败（网络异常、429、5xx）后的重试次数")
+    parser.add_argument("--backoff", type=float, default=0.5,
+                        help="第一次重试前的基准等待秒数，之后每次翻倍并加随机抖动")
+    parser.add_argument("--incremental", action="store_true",
+                        help="增量爬取：跳过已经入库的详情页")
+    parser.add_argument("--ttl", type=float, default=None,
+                        help="增量爬取时记录的有效期（秒），过期的详情页会重新爬取；不指定则一直有效")
+    parser.add_argument("--frontier", default=None,
+                        help=f"爬取进度文件（SQLite），--resume 时默认为 {FRONTIER_PATH}")
+    parser.add_argument("--resume", action="store_true",
+                        help="接着上次中断的地方继续爬，已完成的网页不再爬取")
+    parser.add_argument("--dedup", default="exact", choices=["exact", "bloom"],
+                        help="详情页 URL 去重方式：exact 精确去重，bloom 布隆过滤器（内存固定）")
+    parser.add_argument("--bloom-capacity", type=int, default=1000000,
+                        help="布隆过滤器预计的 URL 数量")
+    parser.add_argument("--images", default=None,
+                        help="封面保存目录，不指定则不下载封面")
+    parser.add_argument("--image-workers", type=int, default=8,
+                        help="封面下载线程数")
+    parser.add_argument("--skip-unchanged", action="store_true",
+                        help="内容哈希没有变化的电影不再写入 MongoDB")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="爬取期间在这个端口上以 Prometheus 文本格式暴露指标")
+    parser.add_argument("--mongo-uri", default=MONGO_URI,
+                        help="MongoDB 连接地址，分布式模式下所有机器要连同一个")
+    parser.add_argument("--db-prefix", default="",
+                        help="数据库名前缀，比如 bench_ 表示写进 bench_Movies 和 bench_Movie_two")
+    return parser
+
+
+def configure(args, prepare=True):
+    """
+    按命令行参数设置当前进程的全局状态，多进程模式下每个子进程都会再调用一次。
+    :param prepare: 是否由当前进程清空或恢复爬取进度，子进程为 False
+    """
+    set_mongo(args.mongo_uri, args.db_prefix)
+    set_base_url(args.base_url)
+    set_session(args.pool_size or POOL_SIZE)
+    set_cache(args.cache_dir, args.offline)
+    set_stream(args.stream)
+    set_parser(args.parser)
+    set_raw_bytes(args.raw_bytes)
+    set_fields(args.fields)
+    set_retry(args.retries, args.backoff)
+    # 令牌桶在每个进程里各有一个，多进程时把速率平分，所有进程加起来才是每个域名的上限
+    processes = max(getattr(args, "workers", 0), 1)
+    set_rate_limit(args.rate / processes if args.rate else None, max(args.burst // processes, 1),
+                   args.adaptive, args.pool_size or POOL_SIZE)
+    set_incremental(args.incremental, args.ttl)
+    # 增量爬取有有效期时，内容没变也要刷新 crawled_at，否则下次又会被当成过期
+    # 只写入部分字段时算出的哈希不代表整条数据，不能用来判断内容有没有变化
+    if args.skip_unchanged and args.fields:
+        logging.warning("--skip-unchanged is ignored together with --fields")
+    set_skip_unchanged(args.skip_unchanged and not args.fields,
+                       ("crawled_at",) if args.incremental and args.ttl is not None else ())
+    set_dedup(args.dedup, args.bloom_capacity, getattr(args, "seen_path", None))
+    set_images(args.images, args.image_workers)
+    set_frontier(args.frontier or (FRONTIER_PATH if args.resume else None), args.resume, prepare)
+    set_queue(getattr(args, "queue", None), getattr(args, "lease", 60), getattr(args, "reset_queue", False), prepare)
+    if prepare and args.metrics_port:
+        METRICS.serve(args.metrics_port)
+
+
+def finish():
+    """
+    爬取结束时调用：等后台任务做完，释放资源。
+    """
+    if DOWNLOADER:
+        DOWNLOADER.close()
+    logging.info("metrics summary\n%s", METRICS.summary())
+
+
+def parse_args(args=None):
+    parser = build_parser()
+    parser.add_argument("--workers", type=int, default=0,
+                        help="进程数，0 表示在当前进程里逐页爬取")
+    parser.add_argument("--queue", default=None,
+                        help="分布式模式：用 Movies 库里的这张表作为多台机器共享的爬取队列")
+    parser.add_argument("--lease", type=float, default=60,
+                        help="分布式模式下一个 URL 的租约时长（秒），超时没完成会被其它进程重新爬取")
+    parser.add_argument("--reset-queue", action="store_true",
+                        help="分布式模式下先清空共享队列，重新爬取整个站点")
+    args = parser.parse_args(args)
+    args.pool_size = args.pool_size or max(args.workers, 1)
+    return args
+
 
+def main(args=None):
+    args = args or parse_args([])
+    if args.adaptive:
+        # spider.py 每个进程只有一个线程在抓取，同一时刻最多一个请求，没有并发可以调
+        logging.warning("--adaptive has no effect here: spider.py fetches with one thread per process, "
+                        "use pipeline.py --fetch-workers N")
+    configure(args)
+    if QUEUE:
+        seed_queue()
+        if args.workers > 0:
+            with Pool(processes=args.workers, initializer=init_worker, initargs=(args,)) as pool:
+                for stages in pool.imap_unordered(crawl_queue, range(args.workers)):
+                    METRICS.merge(stages)
+        else:
+            crawl_queue()
+        logging.info("work queue: %s", QUEUE.counts())
+    elif args.workers > 0:
+        if FRONTIER:
+            # 上次没完成的详情页先在主进程里爬完
+            crawl_details(FRONTIER.pending())
+        total_page, first_html = discover_total_page()
+        # 一页一个任务，页面的请求和 pyquery 解析都在子进程里完成；第一页读总页数时已经爬过，直接把 HTML 交过去
+        tasks = [(page, first_html if page == 1 else None) for page in range(1, total_page + 1)]
+        with tempfile.TemporaryDirectory() as directory:
+            # 每个进程的 SEEN 只管自己，同一个详情页出现在两个进程负责的索引页上会被爬两次，
+            # 所以子进程共用一个 SQLite 去重文件
+            args.seen_path = os.path.join(directory, "seen.db")
+            with Pool(processes=args.workers, initializer=init_worker, initargs=(args,)) as pool:
+                for stages in pool.starmap(crawl_page, tasks, chunksize=1):
+                    METRICS.merge(stages)
+    else:
+        crawl_details(iter_detail_urls())
+    finish()
 
 
 if __name__ == '__main__':
-    main()
+    main(parse_args())
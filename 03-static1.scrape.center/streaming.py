@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+# @Author  : AI悦创
+# @FileName: streaming.py
+# @Software: PyCharm
+# @Blog    ：https://bornforthis.cn/
+# lxml、HTMLPullParser
+"""
+边下载边解析：
+1. 网页内容每下载一块就喂给 lxml 的 HTMLPullParser，不用等整页下载完，也不用把整页内容攒在内存里；
+1. Each downloaded chunk is fed to lxml's HTMLPullParser, so nothing waits for the whole page and the body is never buffered.
+2. 索引页上每张电影卡片一闭合，就马上交出它的详情页 URL，然后清空这张卡片；分页器闭合时顺便读出总页数；
+2. On index pages every movie card yields its detail URL as soon as it closes and is then cleared; the pager is read as it closes.
+3. 详情页上每个字段的 scope 元素一闭合，这个字段就确定了；需要的字段都拿到后不再往下读。
+3. On detail pages a field is final once its scope element closes; reading stops as soon as every wanted field is known.
+-------------------------------------------------
+"""
+import logging
+from urllib.parse import urljoin
+
+from lxml import etree, html as lxml_html
+
+# 详情页链接每张 .el-card 闭合时取一次；分页器和 parsers.parse_total_page 读的是同样的元素
+from parsers import INDEX_LINKS, PAGER_NUMBERS, PAGER_TOTAL, count_pages
+
+
+def iter_closed(chunks, encoding=None):
+    """
+    :param chunks: 网页内容的 bytes 块，比如 response.iter_content()
+    :param encoding: 网页编码，None 表示让 lxml 按 <meta charset> 判断
+    :return: 元素的生成器，按闭合的顺序产出；产出时这个元素和它的子孙都已经完整了
+    """
+    parser = etree.HTMLPullParser(events=("end",), encoding=encoding)
+    # 和 lxml.html 一样生成 HtmlElement，parsers.py 里的 text_content() 才能用
+    parser.set_element_class_lookup(lxml_html.HtmlElementClassLookup())
+    for chunk in chunks:
+        parser.feed(chunk)
+        for _, element in parser.read_events():
+            yield element
+    parser.close()
+    for _, element in parser.read_events():
+        yield element
+
+
+class IndexStream(object):
+    """
+    边下载边解析索引页，遍历它得到详情页 URL。
+    已经交出链接的卡片会被清空，内存里不会攒下整棵树。
+    遍历完以后 complete 为 True，total_page 是分页器里的总页数（读不到时为 None）；下载中途出错时 complete 为 False。
+    """
+
+    def __init__(self, chunks, url, encoding=None):
+        """
+        :param url: 索引页地址，相对链接按它补全
+        """
+        self.chunks = chunks
+        self.url = url
+        self.encoding = encoding
+        self.complete = False
+        self.numbers = []  # 页码按钮上的文字
+        self.total = None  # "共 100 条" 的文字
+        self.links = 0  # 这一页的电影数量
+
+    @property
+    def total_page(self):
+        return count_pages(self.numbers, self.total, self.links)
+
+    def __iter__(self):
+        try:
+            for element in iter_closed(self.chunks, self.encoding):
+                if INDEX_LINKS.in_scope(element):
+                    for href in INDEX_LINKS(element):
+                        self.links += 1
+                        yield urljoin(self.url, href)
+                    element.clear()
+                elif PAGER_NUMBERS.in_scope(element):
+                    self.numbers += PAGER_NUMBERS(element)
+                elif PAGER_TOTAL.in_scope(element) and self.total is None:
+                    self.total = PAGER_TOTAL(element)
+        except OSError:
+            # requests 的网络异常都是 OSError 的子类
+            logging.error("error occurred while streaming %s", self.url, exc_info=True)
+            return
+        self.complete = True
+
+
+def stream_fields(elements, fields):
+    """
+    :param elements: iter_closed 产出的元素
+    :param fields: parsers.Field 列表
+    :return: (字段名, 值) 的生成器，每个字段在它的 scope 第一次匹配到内容时产出；
+             所有字段都产出后立刻结束，剩下的网页不再读取
+    """
+    pending, root = list(fields), None
+    for element in elements:
+        if root is None:
+            root = element.getroottree().getroot()
+        for field in [field for field in pending if field.in_scope(element)]:
+            matches = field.xpath(element)
+            if matches:
+                pending.remove(field)
+                yield field.name, field.value(matches)
+        if not pending:
+            return
+    # 网页里找不到的字段，结果和一次性解析整页时一样
+    for field in pending:
+        yield field.name, field(root) if root is not None else field.value([])
+
+
+def stream_details(chunks, fields, encoding=None):
+    """
+    :return: 和 parsers.parse_details_lxml 一样的字典，字段顺序和 fields 一致
+    """
+    values = dict(stream_fields(iter_closed(chunks, encoding), fields))
+    return {field.name: values[field.name] for field in fields}
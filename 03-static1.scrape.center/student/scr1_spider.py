@@ -0,0 +1,38 @@
+"""
+三个学生版本共用的 Scr1 爬虫：站点地址、请求头和解析都在这里，只写一份。
+请求、并发、去重、批量写入都交给 base_spider.Spider。
+"""
+import os
+import sys
+from bs4 import BeautifulSoup
+from pyquery import PyQuery as pq
+from urllib.parse import urljoin
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from base_spider import Spider
+
+BASE_URL = "https://static1.scrape.center"
+
+
+class Scr1Spider(Spider):
+    base_url = BASE_URL
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/101.0.4951.67 Safari/537.36"
+    }
+
+    def parse_index(self, html):
+        doc = pq(html)
+        links = doc(".el-card .name")
+        for link in links.items():
+            href = link.attr("href")
+            detail_url = urljoin(BASE_URL, href)
+            yield detail_url
+
+    def parse_details(self, html):
+        soup = BeautifulSoup(html, "lxml")
+        img_link = soup.select_one(".el-col .cover")
+        title = soup.select_one("a > h2")
+        return {
+            "name": title.get_text(strip=True) if title else None,
+            "img_cover": img_link.get("src") if img_link else None,
+        }
@@ -8,32 +8,16 @@ release date, rating, and summary of each movie.
 
 # modify website url to send requests to all pages through 1-10 on this website to parse data
 # parse nested url of movie summary from specific movie html
-import requests
-from requests.exceptions import RequestException
 from bs4 import BeautifulSoup
-from pyquery import PyQuery as pq
-from urllib.parse import urljoin
-from multiprocessing import Pool
 
-TOTAL_PAGE = 10
-BASE_URL="https://static1.scrape.center"
-# default_request = requests.get(BASE_URL, headers="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/101.0.4951.67 Safari/537.36")
+from scr1_spider import Scr1Spider
 
-class Scr1(object):
-    def __init__(self):
-        self.headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/101.0.4951.67 Safari/537.36"
-        }
+# default_request = requests.get(BASE_URL, headers="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/101.0.4951.67 Safari/537.36")
 
+# 站点地址、请求头、parse_index 和 parse_details 都在 Scr1Spider 里，总页数从分页器读出来
+class Scr1(Scr1Spider):
     def requests(self, url):
-        try:
-            response = requests.get(url, headers=self.headers)
-            if response.status_code == 200:
-                return response.text
-            else:
-                return "None"
-        except RequestException as e:
-            return e
+        return self.fetch(url)
 
     def parse(self, url):
         html = self.requests(url)
@@ -53,44 +37,6 @@ class Scr1(object):
         print(movie_category)
         return movie_rating
 
-    def scrape_index(self, page="1"):
-        index_url = f"{BASE_URL}/page/{page}"
-        return self.requests(index_url)
-
-    def parse_index(self, html):
-        r_url = []
-        doc = pq(html)
-        links = doc(".el-card .name")
-        for link in links.items():
-            href = link.attr("href")
-            detail_url = urljoin(BASE_URL, href)
-            r_url.append(detail_url)
-        return r_url
-    def scrape_details(self, url):
-        return self.requests(url)
-
-    def parse_details(self, html):
-        soup = BeautifulSoup(html, "lxml")
-        img_link = soup.select(".el-col .cover")
-        print(img_link)
-
-
-    def main(self):
-        # run_result = self.parse()
-        for page in range(1, TOTAL_PAGE + 1):
-            index_html = self.scrape_index(page)
-            # print(index_html)
-            r = self.parse_index(index_html)
-            print(r)
-        #     detail_urls = self.parse_index()
-        #     # print(detail_urls)
-        #     for url in detail_urls:
-        #         html = self.scrape_details(url)
-        #         r = self.parse_details(html)
-        #     return index_html
-        # return run_result
-
-
 
 if __name__ == "__main__":
-    Scr1().main()
+    Scr1().run()
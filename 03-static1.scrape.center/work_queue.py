@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+# @Author  : AI悦创
+# @FileName: work_queue.py
+# @Software: PyCharm
+# @Blog    ：https://bornforthis.cn/
+# PymongoDB
+"""
+多台机器共用的爬取队列：
+1. 队列就是 MongoDB 里的一张表，每个 URL 一条记录，_id 就是 URL，同一个 URL 只会入队一次；
+1. The queue is a MongoDB collection with one document per URL keyed by _id, so a URL is only ever enqueued once.
+2. 取任务用 find_one_and_update 原子地「租用」一个 URL，同一时刻只有一个进程能拿到它；
+2. Workers lease a URL atomically with find_one_and_update, so only one process holds it at a time.
+3. 租约到期还没完成（进程崩溃、机器断网）的 URL 会被其它进程重新租走，不会丢任务。
+3. A lease that expires before the URL is done (crashed process, lost machine) is picked up by another worker.
+
+python spider.py --queue crawl_queue --workers 4                 # 机器 A
+python spider.py --queue crawl_queue --workers 4 --mongo-uri ... # 机器 B，连同一个 MongoDB
+python work_queue.py --mongo-uri ...                             # 在临时的表里检查租用、租约过期和 active()
+-------------------------------------------------
+"""
+import argparse
+import datetime
+import os
+import socket
+import sys
+import time
+import uuid
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+QUEUED = "queued"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+
+
+def utcnow():
+    return datetime.datetime.utcnow()
+
+
+class WorkQueue(object):
+    def __init__(self, collection, lease=60, max_attempts=3):
+        """
+        :param collection: 存放队列的 MongoDB 表，所有机器用同一张
+        :param lease: 租约时长（秒），超过这个时间还没完成的 URL 会被其它进程重新租走
+        :param max_attempts: 一个 URL 最多被租几次，一直失败的 URL 不再重试
+        """
+        self.collection = collection
+        self.lease = datetime.timedelta(seconds=lease)
+        self.max_attempts = max_attempts
+        # 主机名 + 进程号 + 随机串，区分是谁租走了 URL
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.collection.create_index([("state", 1), ("kind", 1), ("lease_until", 1)])
+
+    def reset(self):
+        """
+        清空队列，重新爬取整个站点时使用。
+        """
+        self.collection.delete_many({})
+
+    def add(self, url, kind="detail"):
+        """
+        :return: True 表示这是一个新 URL；已经在队列里的（不管是谁放进来的、爬没爬完）返回 False
+        """
+        try:
+            result = self.collection.update_one({"_id": url}, {"$setOnInsert": self._new(kind)}, upsert=True)
+        except DuplicateKeyError:
+            # 两个进程同时放入同一个 URL，另一个进程先插入成功了
+            return False
+        return result.upserted_id is not None
+
+    def add_many(self, urls, kind="detail"):
+        """
+        一次请求放入一批 URL。
+        :return: 新放入的 URL 数量
+        """
+        operations = [UpdateOne({"_id": url}, {"$setOnInsert": self._new(kind)}, upsert=True) for url in urls]
+        if not operations:
+            return 0
+        try:
+            return self.collection.bulk_write(operations, ordered=False).upserted_count
+        except BulkWriteError as error:
+            return error.details.get("nUpserted", 0)
+
+    def lease_next(self):
+        """
+        原子地租用一个 URL：排队中的，或者租约已经过期的。
+        :return: (url, kind)，暂时没有可租的 URL 时返回 None
+        """
+        now = utcnow()
+        document = self.collection.find_one_and_update(
+            {
+                "$or": [{"state": QUEUED}, {"state": IN_FLIGHT, "lease_until": {"$lt": now}}],
+                "attempts": {"$lt": self.max_attempts},
+            },
+            {
+                "$set": {"state": IN_FLIGHT, "owner": self.owner, "lease_until": now + self.lease, "updated_at": now},
+                "$inc": {"attempts": 1},
+            },
+            # 索引页排在详情页前面，先把 URL 都找出来
+            sort=[("kind", -1), ("created_at", 1)],
+            projection={"kind": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        return (document["_id"], document["kind"]) if document else None
+
+    def has_kind(self, kind):
+        """
+        :return: 队列里有没有这一类 URL（不管什么状态），比如索引页是不是已经有机器放进来了
+        """
+        return self.collection.count_documents({"kind": kind}, limit=1) > 0
+
+    def done(self, url):
+        self.collection.update_one({"_id": url}, {"$set": {"state": DONE, "updated_at": utcnow()}})
+
+    def release(self, url):
+        """
+        爬取失败，把 URL 放回队列，稍后由任意进程重试（最多 max_attempts 次）。
+        """
+        self.collection.update_one({"_id": url, "owner": self.owner},
+                                   {"$set": {"state": QUEUED, "updated_at": utcnow()}})
+
+    def active(self):
+        """
+        :return: 还可能产生新任务的 URL 数量：排队中的，以及正在被租用、租约还没过期的
+        """
+        now = utcnow()
+        return self.collection.count_documents({
+            "$or": [{"state": QUEUED}, {"state": IN_FLIGHT, "lease_until": {"$gte": now}}],
+            "attempts": {"$lt": self.max_attempts},
+        })
+
+    def counts(self):
+        return {item["_id"]: item["count"]
+                for item in self.collection.aggregate([{"$group": {"_id": "$state", "count": {"$sum": 1}}}])}
+
+    def _new(self, kind):
+        now = utcnow()
+        return {"kind": kind, "state": QUEUED, "attempts": 0, "created_at": now, "updated_at": now}
+
+
+def check_queue(collection, lease=1):
+    """
+    用两个 WorkQueue 模拟两台机器，按顺序检查队列的行为。
+    :param collection: 临时的 MongoDB 表，会被清空
+    :param lease: 租约时长（秒），检查过程中要等它过期一次
+    :return: 没通过的检查 [(描述, 期望, 实际)]
+    """
+    failures = []
+
+    def expect(description, expected, actual):
+        if expected != actual:
+            failures.append((description, expected, actual))
+
+    first, second = WorkQueue(collection, lease), WorkQueue(collection, lease)
+    first.reset()
+    expect("empty queue has no index pages", False, first.has_kind("index"))
+    expect("add a new url", True, first.add("/detail/1"))
+    expect("add the same url again", False, second.add("/detail/1"))
+    expect("add_many skips queued urls", 1, first.add_many(["/detail/1", "/page/1"], kind="index"))
+    expect("index pages are seeded", True, second.has_kind("index"))
+    # 索引页先租出去
+    expect("lease the index page first", ("/page/1", "index"), first.lease_next())
+    expect("then the detail page", ("/detail/1", "detail"), first.lease_next())
+    expect("nothing left to lease", None, second.lease_next())
+    expect("leased urls are active", 2, second.active())
+    second.release("/detail/1")  # 不是自己租的 URL，放不回去
+    expect("release by another owner is ignored", None, second.lease_next())
+    first.done("/page/1")
+    expect("done urls are not active", 1, first.active())
+    time.sleep(lease + 0.5)
+    expect("expired leases are not active", 0, first.active())
+    expect("an expired lease can be taken over", ("/detail/1", "detail"), second.lease_next())
+    second.release("/detail/1")
+    expect("released urls are active again", 1, first.active())
+    expect("released urls can be leased again", ("/detail/1", "detail"), first.lease_next())
+    first.release("/detail/1")
+    expect("urls leased max_attempts times are dropped", None, second.lease_next())
+    expect("dropped urls are not active", 0, second.active())
+    expect("counts by state", {QUEUED: 1, DONE: 1}, first.counts())
+    return failures
+
+
+def main():
+    # 在这里再导入，spider.py 导入本模块时用不到
+    from inster_data_function import MONGO_URI, get_client
+
+    parser = argparse.ArgumentParser(description="在临时的 MongoDB 表里检查共享队列")
+    parser.add_argument("--mongo-uri", default=MONGO_URI, help="MongoDB 连接地址")
+    parser.add_argument("--db", default="work_queue_check", help="临时数据库名，检查结束后删除")
+    parser.add_argument("--lease", type=float, default=1, help="租约时长（秒）")
+    args = parser.parse_args()
+
+    client = get_client(args.mongo_uri)
+    try:
+        failures = check_queue(client[args.db]["queue"], args.lease)
+    finally:
+        client.drop_database(args.db)
+    for description, expected, actual in failures:
+        print(description)
+        print("  expected:", expected)
+        print("  actual:  ", actual)
+    print("work queue check", "failed" if failures else "passed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()